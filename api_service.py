@@ -0,0 +1,230 @@
+# api_service.py
+"""
+Local HTTP API for the humanizer and detectors, as a plain ASGI app.
+
+    uvicorn api_service:app --host 127.0.0.1 --port 8000
+    python api_service.py
+
+POST /humanize  {"text": ..., "strength": 3, "seed": null}  -> {"text": ...}
+POST /score     {"text": ...}                               -> {"score": ..., "cached": bool}
+POST /classify  {"text": ..., "threshold": 0.8}             -> {"classification": [...], "percentages": {...}}
+GET  /health                                                -> pool capacity, load, score cache hits and stage timings
+
+Humanizing and scoring run in a process pool (spaCy and the word lists load once per
+worker); detection runs on a thread pool whose callers are coalesced into shared
+forward passes by the detector batcher. Once HUMANIZER_API_MAX_PENDING requests are
+in flight, new ones get 429 instead of queuing. If a worker process dies, the process
+pool is rebuilt and the requests it was running get 503.
+"""
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from humanize_cli import init_worker
+
+API_WORKERS = int(os.environ.get("HUMANIZER_API_WORKERS", os.cpu_count() or 1))
+API_DETECTOR_THREADS = int(os.environ.get("HUMANIZER_API_DETECTOR_THREADS", 8))
+API_MAX_PENDING = int(os.environ.get("HUMANIZER_API_MAX_PENDING", API_WORKERS * 4))
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+########################################
+# Work functions (run inside the pools)
+########################################
+def humanize_job(text, strength, seed=None):
+    from pages.humanize_text import advanced_humanize
+    return {"text": advanced_humanize(text, strength=strength, seed=seed)}
+
+def score_job(text):
+    from pages.humanize_text import cached_ai_probability, get_result_cache
+    # Each worker has its own cache; report whether this lookup hit so the server can total them
+    cache = get_result_cache()
+    hits = cache.hits
+    score = cached_ai_probability(text)
+    return {"score": score, "cached": cache.hits > hits}
+
+def classify_job(text, threshold):
+    from utils.ai_detection_utils import classify_text_hf
+    from utils.detector_batcher import get_detector_batcher
+    classification_map, percentages = classify_text_hf(text, threshold=threshold, batcher=get_detector_batcher())
+    return {
+        "classification": [
+            {"sentence": sentence, "label": label} for sentence, label in classification_map.items()
+        ],
+        "percentages": percentages,
+    }
+
+########################################
+# Service state
+########################################
+class Service:
+    """Owns the worker pools and the in-flight counter used for backpressure."""
+
+    def __init__(self, workers=API_WORKERS, detector_threads=API_DETECTOR_THREADS, max_pending=API_MAX_PENDING):
+        self.workers = workers
+        self.detector_threads = detector_threads
+        self.max_pending = max_pending
+        self.pending = 0
+        self.score_cache = {"hits": 0, "misses": 0}
+        self.process_pool = None
+        self.thread_pool = None
+
+    def start(self):
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+            self.thread_pool = ThreadPoolExecutor(max_workers=self.detector_threads)
+
+    def restart_process_pool(self, broken):
+        """Replace a broken process pool; no-op if another request already replaced it."""
+        if self.process_pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def stop(self):
+        if self.process_pool is not None:
+            self.process_pool.shutdown(cancel_futures=True)
+            self.thread_pool.shutdown(cancel_futures=True)
+            self.process_pool = self.thread_pool = None
+
+    async def submit(self, pool_name, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPError(429, "Server busy, retry later", [(b"retry-after", b"1")])
+        self.start()
+        pool = self.process_pool if pool_name == "process" else self.thread_pool
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # Not retried here: the input that killed the worker could kill the new pool too
+            self.restart_process_pool(pool)
+            raise HTTPError(503, "Worker process died, retry later", [(b"retry-after", b"1")])
+        finally:
+            self.pending -= 1
+
+service = Service()
+
+########################################
+# Request handling
+########################################
+def _require_text(payload):
+    text = payload.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise HTTPError(400, "'text' must be a non-empty string")
+    return text
+
+async def handle_humanize(payload):
+    strength = payload.get("strength", 3)
+    # bool is an int subclass and 3.0 == 3, so `in range` alone would let both through
+    if type(strength) is not int or not 1 <= strength <= 5:
+        raise HTTPError(400, "'strength' must be an integer from 1 to 5")
+    seed = payload.get("seed")
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise HTTPError(400, "'seed' must be an integer or null")
+    return await service.submit("process", humanize_job, _require_text(payload), strength, seed)
+
+async def handle_score(payload):
+    result = await service.submit("process", score_job, _require_text(payload))
+    service.score_cache["hits" if result["cached"] else "misses"] += 1
+    return result
+
+async def handle_classify(payload):
+    threshold = payload.get("threshold", 0.8)
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+        raise HTTPError(400, "'threshold' must be a number between 0 and 1")
+    return await service.submit("thread", classify_job, _require_text(payload), float(threshold))
+
+async def handle_health(payload):
+    from utils.instrumentation import stage_summary
+    from utils.model_registry import registry
+    # Health checks must stay cheap: only report the detector cache once detection has
+    # imported it, rather than pulling torch/transformers into the server for a probe
+    detection = sys.modules.get("utils.ai_detection_utils")
+    return {
+        "status": "ok",
+        "pending": service.pending,
+        "max_pending": service.max_pending,
+        "workers": service.workers,
+        "score_cache": dict(service.score_cache),
+        "models": registry.memory_report(),
+        "detector_cache": detection.get_detector_cache().stats() if detection else None,
+        # Stage histograms of this process (detection); None unless a histogram sink is on
+        "stages": stage_summary(),
+    }
+
+ROUTES = {
+    ("POST", "/humanize"): handle_humanize,
+    ("POST", "/score"): handle_score,
+    ("POST", "/classify"): handle_classify,
+    ("GET", "/health"): handle_health,
+}
+
+async def _read_json(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        more_body = message.get("more_body", False)
+    if not body:
+        return {}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return payload
+
+async def _send_json(send, status, data, headers=()):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            service.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            service.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    try:
+        if handler is None:
+            raise HTTPError(404, "Not found")
+        payload = await _read_json(receive) if scope["method"] == "POST" else {}
+        await _send_json(send, 200, await handler(payload))
+    except HTTPError as e:
+        await _send_json(send, e.status, {"error": e.message}, e.headers)
+    except Exception as e:
+        await _send_json(send, 500, {"error": f"{type(e).__name__}: {e}"})
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("HUMANIZER_API_HOST", "127.0.0.1"),
+                port=int(os.environ.get("HUMANIZER_API_PORT", 8000)))
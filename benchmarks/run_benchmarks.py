@@ -0,0 +1,256 @@
+# benchmarks/run_benchmarks.py
+"""
+Latency benchmarks for the humanizer and detection pipelines.
+
+    python -m benchmarks.run_benchmarks -o bench.json             # 1k/10k/100k words
+    python -m benchmarks.run_benchmarks --sizes 1000 --models     # include classify_text_hf
+    python -m benchmarks.run_benchmarks compare old.json new.json
+
+Corpora are generated deterministically, so runs on different commits time the
+same input. Every advanced_humanize stage is timed separately, from the stage()
+records of seeded advanced_humanize runs, alongside calculate_ai_probability,
+classify_text_hf and the PDF extraction/annotation helpers. Results are written as JSON; compare prints the
+per-stage change between two result files.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+CORPUS_SEED = 1234
+REGRESSION_THRESHOLD = 0.10
+
+########################################
+# Corpora
+########################################
+SUBJECTS = ["The proposed framework", "Our analysis", "This study", "The model", "Previous research",
+            "The dataset", "The experimental setup", "Each participant", "The survey", "The algorithm"]
+VERBS = ["demonstrates", "shows", "indicates", "suggests", "reveals", "highlights", "confirms", "supports"]
+OBJECTS = ["a significant improvement in accuracy", "that the results are robust", "a strong correlation",
+           "the importance of careful evaluation", "several limitations of earlier methods",
+           "that performance does not degrade", "a clear trend across conditions", "consistent gains"]
+OPENERS = ["", "", "", "Furthermore, ", "Moreover, ", "In conclusion, ", "It is important to note that ",
+           "Additionally, ", "However, "]
+CLAUSES = ["", "", " because it is not limited by sample size", " when the data are noisy",
+           " and we have found that this holds in practice", " as reported (Smith et al., 2021)",
+           " which is consistent with prior work (Lee & Park, 2019, pp. 10-12)"]
+
+# Hand-written paragraphs, repeated to size: less uniform than the synthetic corpus
+SAMPLE_PARAGRAPHS = [
+    "Climate adaptation in coastal cities is not only an engineering problem. It is important to note "
+    "that planners must weigh cost, equity and ecological impact (Nguyen, 2020). In many cases, they do "
+    "not have reliable data on future flood risk, so decisions are made under deep uncertainty.",
+    "Honestly, I wasn't sure the pilot would work. The first prototype failed twice, and we could not "
+    "figure out why. Furthermore, the sensors drifted overnight. After a week of debugging it turned out "
+    "to be a loose ground wire, which is the kind of thing you only find by accident.",
+    "In conclusion, the evidence suggests that early intervention improves long-term outcomes. "
+    "Moreover, the effect is larger for students who were struggling at baseline (Garcia & Lee, 2018, "
+    "pp. 45-47). It is worth noting that the study did not track participants beyond five years.",
+]
+
+def synthetic_corpus(words, seed=CORPUS_SEED):
+    """Deterministic academic-style text of roughly `words` words."""
+    rng = random.Random(seed)
+    paragraphs, sentences, count = [], [], 0
+    while count < words:
+        sentence = (f"{rng.choice(OPENERS)}{rng.choice(SUBJECTS)} {rng.choice(VERBS)} "
+                    f"{rng.choice(OBJECTS)}{rng.choice(CLAUSES)}.")
+        sentence = sentence[0].upper() + sentence[1:]
+        sentences.append(sentence)
+        count += len(sentence.split())
+        if len(sentences) >= rng.randint(3, 7):
+            paragraphs.append(" ".join(sentences))
+            sentences = []
+    if sentences:
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+def sample_corpus(words):
+    """The sample paragraphs repeated until the text has roughly `words` words."""
+    paragraphs, count, i = [], 0, 0
+    while count < words:
+        paragraph = SAMPLE_PARAGRAPHS[i % len(SAMPLE_PARAGRAPHS)]
+        paragraphs.append(paragraph)
+        count += len(paragraph.split())
+        i += 1
+    return "\n\n".join(paragraphs)
+
+CORPORA = {"synthetic": synthetic_corpus, "sample": sample_corpus}
+
+PDF_LINE_CHARS = 95
+PDF_LINES_PER_PAGE = 64
+
+def text_to_pdf(text):
+    """Lay text out on A4 pages with PyMuPDF and return the PDF bytes."""
+    import fitz
+    import textwrap
+    lines = []
+    for paragraph in text.split("\n\n"):
+        lines.extend(textwrap.wrap(paragraph, PDF_LINE_CHARS) + [""])
+    doc = fitz.open()
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        page = doc.new_page()
+        for i, line in enumerate(lines[start:start + PDF_LINES_PER_PAGE]):
+            if line:
+                page.insert_text((54, 60 + i * 11.5), line, fontsize=9, fontname="helv")
+    pdf_bytes = doc.write()
+    doc.close()
+    return pdf_bytes
+
+########################################
+# Timing
+########################################
+def time_call(fn, repeat):
+    """Run fn repeat times; returns (timing summary, last result)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return {"median": statistics.median(samples), "min": min(samples), "runs": repeat}, result
+
+def bench_corpus(text, repeat, models=False, pdf=True):
+    """Time every stage on one corpus; returns {stage: timing summary}."""
+    import pages.humanize_text as ht
+    from utils.ai_detection_utils import LABELS
+    from utils.instrumentation import capture
+    from utils.pdf_utils import extract_text_from_pdf, generate_annotated_pdf
+
+    results = {}
+    # The stages come from the stage() records of real advanced_humanize runs,
+    # one seed per repetition, so they always match what the app executes
+    totals = {}
+    for seed in range(repeat):
+        with capture() as records:
+            ht.advanced_humanize(text, seed=seed)
+        for record in records:
+            if record["stage"] == "advanced_humanize" or record["stage"].startswith("humanize."):
+                totals.setdefault(record["stage"], []).append(record["wall_seconds"])
+    for name, samples in totals.items():
+        results[name] = {"median": statistics.median(samples), "min": min(samples), "runs": len(samples)}
+
+    results["calculate_ai_probability"], _ = time_call(lambda: ht.calculate_ai_probability(text), repeat)
+
+    if models:
+        from utils.ai_detection_utils import DETECTOR_CACHE_SIZE, classify_text_hf
+        from utils.result_cache import ResultCache
+
+        # Private caches: the shared detector cache (and its SQLite tier) is never touched
+        results["classify_text_hf"], _ = time_call(
+            lambda: classify_text_hf(text, cache=ResultCache(maxsize=DETECTOR_CACHE_SIZE)), repeat
+        )
+        warm = ResultCache(maxsize=DETECTOR_CACHE_SIZE)
+        classify_text_hf(text, cache=warm)
+        results["classify_text_hf.cached"], _ = time_call(lambda: classify_text_hf(text, cache=warm), repeat)
+
+    if pdf:
+        from nltk.tokenize import sent_tokenize
+        pdf_bytes = text_to_pdf(text)
+        results["extract_text_from_pdf"], extracted = time_call(lambda: extract_text_from_pdf(pdf_bytes), repeat)
+        # Labels cycle deterministically so annotation cost doesn't depend on a model
+        classification_map = {
+            sentence: LABELS[i % len(LABELS)] for i, sentence in enumerate(sent_tokenize(extracted))
+        }
+        results["generate_annotated_pdf"], _ = time_call(
+            lambda: generate_annotated_pdf(pdf_bytes, classification_map), repeat
+        )
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes=DEFAULT_SIZES, corpora=tuple(CORPORA), repeat=3, models=False, pdf=True, log=sys.stderr):
+    from utils.resources import warm_up
+    warm_up()
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": {},
+    }
+    for corpus in corpora:
+        for size in sizes:
+            name = f"{corpus}-{size // 1000}k"
+            print(f"Benchmarking {name}...", file=log)
+            text = CORPORA[corpus](size)
+            report["results"][name] = {
+                "words": len(text.split()),
+                "stages": bench_corpus(text, repeat, models=models, pdf=pdf),
+            }
+    return report
+
+########################################
+# Comparison
+########################################
+def compare(old, new, threshold=REGRESSION_THRESHOLD, out=sys.stdout):
+    """Print median latency per stage for two reports; returns the regressed (corpus, stage) pairs."""
+    regressions = []
+    print(f"{'corpus':<16}{'stage':<28}{'old (s)':>10}{'new (s)':>10}{'change':>9}", file=out)
+    for corpus, entry in new["results"].items():
+        old_stages = old["results"].get(corpus, {}).get("stages", {})
+        for stage, timing in entry["stages"].items():
+            if stage not in old_stages:
+                continue
+            before, after = old_stages[stage]["median"], timing["median"]
+            change = (after - before) / before if before else 0.0
+            marker = ""
+            if change > threshold:
+                marker = "  !"
+                regressions.append((corpus, stage))
+            print(f"{corpus:<16}{stage:<28}{before:>10.4f}{after:>10.4f}{change:>+9.1%}{marker}", file=out)
+    return regressions
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "compare":
+        parser = argparse.ArgumentParser(prog="run_benchmarks compare",
+                                         description="Compare two benchmark result files.")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                            help="Relative slowdown reported as a regression (default: 0.10)")
+        args = parser.parse_args(argv[1:])
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    parser = argparse.ArgumentParser(description="Time the humanizer and detection pipelines.")
+    parser.add_argument("-o", "--output", default="-", help="JSON output path (default: stdout)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Corpus sizes in words")
+    parser.add_argument("--corpora", nargs="+", choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median is reported")
+    parser.add_argument("--models", action="store_true", help="Also time classify_text_hf (loads the detector)")
+    parser.add_argument("--no-pdf", action="store_true", help="Skip the PDF extraction/annotation timings")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.corpora, args.repeat, models=args.models, pdf=not args.no_pdf)
+    payload = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# humanize_cli.py
+"""
+Headless batch runner: humanize and/or score whole corpora without the Streamlit UI.
+
+    python humanize_cli.py docs/ "drafts/**/*.txt" requests.jsonl -o results.jsonl
+
+Directories contribute their .txt/.md files, other arguments are treated as globs,
+and .jsonl inputs yield one document per line. Documents are fanned out across a
+process pool and results stream to JSONL as they finish, in input order. Inputs
+that can't be read or parsed get an {"id", "error"} record instead of ending the run.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+TEXT_EXTENSIONS = (".txt", ".md")
+TEXT_FIELDS = ("text", "body")
+ID_FIELDS = ("id", "request_id")
+
+def _field(record, preferred, fallbacks):
+    for name in (preferred,) + fallbacks:
+        if name and name in record:
+            return record[name]
+    return None
+
+def _error(doc_id, e):
+    """Result record for a document that could not be read; same shape as worker failures."""
+    return {"id": doc_id, "error": f"{type(e).__name__}: {e}"}
+
+def iter_jsonl(path, text_field=None, id_field=None):
+    # Lines are decoded one at a time, so a bad line becomes an error record, not a crash
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        yield _error(path, e)
+        return
+    with f:
+        for line_no, raw in enumerate(f, start=1):
+            try:
+                line = raw.decode("utf-8")
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            except (UnicodeDecodeError, ValueError) as e:  # JSONDecodeError is a ValueError
+                yield _error(f"{path}:{line_no}", e)
+                continue
+            text = _field(record, text_field, TEXT_FIELDS)
+            if text is None:
+                continue
+            doc_id = _field(record, id_field, ID_FIELDS)
+            yield {"id": doc_id if doc_id is not None else f"{path}:{line_no}", "text": text}
+
+def iter_text_file(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        yield _error(path, e)
+        return
+    yield {"id": path, "text": text}
+
+def iter_paths(inputs):
+    """Expand directories and globs into file paths, keeping argument order."""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if name.endswith(TEXT_EXTENSIONS + (".jsonl",)):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(item):
+            yield item
+        else:
+            # "dir/**" also matches directories; only files are documents
+            yield from (path for path in sorted(glob.glob(item, recursive=True)) if os.path.isfile(path))
+
+def iter_documents(inputs, text_field=None, id_field=None):
+    for path in iter_paths(inputs):
+        if path.endswith(".jsonl"):
+            yield from iter_jsonl(path, text_field, id_field)
+        else:
+            yield from iter_text_file(path)
+
+########################################
+# Worker process
+########################################
+def init_worker():
+    """Load NLTK data, spaCy and the synonym index once per worker process."""
+    from utils.resources import warm_up
+    from utils.synonym_index import get_synonym_index
+    import pages.humanize_text as humanize_text
+    # The pool already uses every core; keep spaCy single-process inside it
+    humanize_text.SYNONYM_MAX_PROCESSES = 1
+    warm_up()
+    get_synonym_index()
+
+def process_document(doc, mode, strength, seed=None, chunked=False):
+    from pages.humanize_text import advanced_humanize, cached_ai_probability, get_result_cache, iter_humanize
+    result = {"id": doc["id"]}
+    cache = get_result_cache()
+    hits, misses = cache.hits, cache.misses
+    try:
+        text = doc["text"]
+        if mode in ("score", "both"):
+            result["input_score"] = cached_ai_probability(text)
+        if mode in ("humanize", "both"):
+            if chunked:
+                result["humanized"] = "".join(iter_humanize(text, strength=strength, seed=seed))
+            else:
+                result["humanized"] = advanced_humanize(text, strength=strength, seed=seed)
+            if mode == "both":
+                result["output_score"] = cached_ai_probability(result["humanized"])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    # Score-cache lookups for this document; run() strips these and totals them
+    result["_cache_hits"] = cache.hits - hits
+    result["_cache_misses"] = cache.misses - misses
+    return result
+
+def run(documents, out, mode="both", strength=3, workers=None, max_pending=None, seed=None, chunked=False,
+        cache_stats=None):
+    """
+    Fan documents out over a process pool, writing each result as one JSON line.
+    cache_stats, if given, receives the score cache's total "hits" and "misses".
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    cache_stats = {} if cache_stats is None else cache_stats
+    cache_stats.update(hits=0, misses=0)
+    pending = deque()
+    written = 0
+
+    def write(result):
+        cache_stats["hits"] += result.pop("_cache_hits", 0)
+        cache_stats["misses"] += result.pop("_cache_misses", 0)
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        for doc in documents:
+            if "error" in doc:
+                # Unreadable input: its error record keeps its place in the output order
+                future = Future()
+                future.set_result(doc)
+            else:
+                future = pool.submit(process_document, doc, mode, strength, seed, chunked)
+            pending.append(future)
+            # Bound the number of in-flight documents so huge corpora stream
+            if len(pending) >= max_pending:
+                write(pending.popleft().result())
+                written += 1
+        while pending:
+            write(pending.popleft().result())
+            written += 1
+    out.flush()
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Humanize and/or score documents in bulk.")
+    parser.add_argument("inputs", nargs="+", help="Directories, glob patterns, text files or .jsonl files")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path (default: stdout)")
+    parser.add_argument("--mode", choices=["humanize", "score", "both"], default="both")
+    parser.add_argument("--strength", type=int, default=3, choices=range(1, 6), metavar="1-5")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible output (default: random)")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Humanize in paragraph windows with bounded memory (for book-length documents)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--text-field", default=None, help="JSONL field holding the text (default: text/body)")
+    parser.add_argument("--id-field", default=None, help="JSONL field holding the id (default: id/request_id)")
+    args = parser.parse_args(argv)
+
+    documents = iter_documents(args.inputs, args.text_field, args.id_field)
+    cache_stats = {}
+    options = dict(seed=args.seed, chunked=args.chunked, cache_stats=cache_stats)
+    if args.output == "-":
+        written = run(documents, sys.stdout, args.mode, args.strength, args.workers, **options)
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            written = run(documents, out, args.mode, args.strength, args.workers, **options)
+    print(
+        f"Processed {written} documents (score cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses)",
+        file=sys.stderr
+    )
+
+if __name__ == "__main__":
+    main()
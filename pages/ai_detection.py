@@ -2,8 +2,16 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from utils.pdf_utils import extract_text_from_pdf, generate_annotated_pdf, word_count
-from utils.ai_detection_utils import classify_text_hf  # Defined in utils/ai_detection_utils.py
+from utils.pdf_utils import (
+    PARALLEL_MIN_PAGES,
+    PDF_WORKERS,
+    parallel_annotate_pdf,
+    parallel_extract_text,
+    pdf_page_count,
+    stream_classify_pdf
+)
+from utils.ai_detection_utils import classify_text_hf
+from utils.detector_batcher import get_detector_batcher
 from io import BytesIO
 
 def show_pdf_detection_page():
@@ -108,27 +116,45 @@ def show_pdf_detection_page():
         # Only process if not already processed
         if not st.session_state["pdf_processed"]:
             pdf_bytes = uploaded_pdf.read()
-            with st.spinner("📄 Extracting text from PDF..."):
-                extracted = extract_text_from_pdf(pdf_bytes)
-                st.session_state["original_pdf_text"] = extracted
+            if pdf_page_count(pdf_bytes) >= PARALLEL_MIN_PAGES and PDF_WORKERS > 1:
+                # Large upload: split page ranges across worker processes
+                with st.spinner(f"📄 Extracting text from PDF on {PDF_WORKERS} cores..."):
+                    extracted = parallel_extract_text(pdf_bytes)
+                with st.spinner("🤖 Analyzing content with AI detection..."):
+                    c_map, pcts = classify_text_hf(extracted, batcher=get_detector_batcher())
+                    st.session_state["percentages"] = pcts
+                with st.spinner("🎨 Generating annotated PDF..."):
+                    st.session_state["annotated_pdf"] = parallel_annotate_pdf(pdf_bytes, c_map)
+                text_parts = [extracted]
+            else:
+                progress_bar = st.progress(0.0, text="📄 Reading PDF...")
+                c_map = {}
+                text_parts = []
+                for event in stream_classify_pdf(pdf_bytes, batcher=get_detector_batcher()):
+                    if event.get("done"):
+                        st.session_state["percentages"] = event["percentages"]
+                        st.session_state["annotated_pdf"] = event["annotated_pdf"]
+                        break
+                    # Results arrive page by page, before the rest of the PDF is read
+                    for sentence, label in event["classified"]:
+                        c_map[sentence] = label
+                        text_parts.append(sentence)
+                    progress_bar.progress(
+                        event["page"] / event["pages"],
+                        text=f"🤖 Analyzed page {event['page']} of {event['pages']}..."
+                    )
+                progress_bar.empty()
+            st.session_state["classification_map"] = c_map
+            st.session_state["original_pdf_text"] = " ".join(text_parts)
 
             if not st.session_state["original_pdf_text"].strip():
                 st.error(
                     "❌ No text could be extracted from this PDF. Please ensure it contains selectable text.")
                 st.session_state["pdf_processed"] = False
+                st.session_state["percentages"] = None
+                st.session_state["annotated_pdf"] = None
                 return
 
-            with st.spinner("🤖 Analyzing content with AI detection..."):
-                c_map, pcts = classify_text_hf(
-                    st.session_state["original_pdf_text"])
-                st.session_state["classification_map"] = c_map
-                st.session_state["percentages"] = pcts
-
-            with st.spinner("🎨 Generating annotated PDF..."):
-                annotated = generate_annotated_pdf(
-                    pdf_bytes, st.session_state["classification_map"])
-                st.session_state["annotated_pdf"] = annotated
-
             # Mark as processed to avoid re-running
             st.session_state["pdf_processed"] = True
             st.rerun()  # Refresh to show results without processing messages
@@ -1,57 +1,38 @@
 # pages/humanize_text.py
+import math
+import os
 import random
 import re
-import ssl
 import warnings
-import nltk
-import spacy
 import streamlit as st
 from nltk.corpus import wordnet
 from nltk.tokenize import sent_tokenize, word_tokenize
-import time
-from collections import Counter
+from collections import Counter, namedtuple
 import numpy as np
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 ########################################
-# NLTK Setup
+# NLTK / SpaCy Setup
 ########################################
-def download_nltk_resources():
-    try:
-        _create_unverified_https_context = ssl._create_unverified_context
-    except AttributeError:
-        pass
-    else:
-        ssl._create_default_https_context = _create_unverified_https_context
-
-    for r in ['punkt', 'averaged_perceptron_tagger', 'punkt_tab', 'wordnet', 'averaged_perceptron_tagger_eng']:
-        nltk.download(r, quiet=True)
-
-download_nltk_resources()
+# Both are loaded lazily on first use; utils.resources.warm_up() preloads them.
+from utils.resources import ensure_nltk_data, load_spacy_model
 
 ########################################
-# SpaCy Setup
+# Word lists
+# Read from the compiled index file (mmap) rather than by importing word_lists.py;
+# python -m utils.synonym_index rebuilds it, and it refreshes itself when stale.
 ########################################
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    st.warning("Install spaCy model: python -m spacy download en_core_web_sm")
-    nlp = None
+from utils.result_cache import ResultCache, make_key
+from utils.synonym_index import get_synonym_index, get_word_tables
 
-########################################
-# PASTE YOUR FULL WORD LISTS HERE
-# Import from word_lists.py (create separate file)
-########################################
-from word_lists import (
-    PRESERVE_WORDS,
-    ULTRA_SYNONYMS,
-    DIVERSE_STARTERS,
-    AI_RED_FLAGS,
-    CONTRACTIONS_MAP,
-    HUMAN_FILLERS,
-    INFORMAL_REPLACEMENTS
-)
+_WORD_TABLES = get_word_tables()
+DIVERSE_STARTERS = _WORD_TABLES["DIVERSE_STARTERS"]
+AI_RED_FLAGS = _WORD_TABLES["AI_RED_FLAGS"]
+CONTRACTIONS_MAP = _WORD_TABLES["CONTRACTIONS_MAP"]
+HUMAN_FILLERS = _WORD_TABLES["HUMAN_FILLERS"]
+INFORMAL_REPLACEMENTS = _WORD_TABLES["INFORMAL_REPLACEMENTS"]
+from utils.instrumentation import capture, instrumented, stage, stage_summary
 
 ########################################
 # Citation Handling
@@ -74,29 +55,103 @@ def restore_citations(text, placeholder_map):
         return placeholder_map.get(match.group(0), match.group(0))
     return PLACEHOLDER_REGEX.sub(replace_placeholder, text)
 
+########################################
+# Compiled AI Red-Flag Engine
+########################################
+# Every AI_RED_FLAGS pattern compiled once at import and indexed by its leading word,
+# so each word in the text is only tried against the flags that can start there.
+# Candidates keep the table order, so at a given position the earlier entry wins
+# (e.g. "due to the fact that" before "the fact that"), like the old per-entry loop.
+RED_FLAG_TABLE = list(AI_RED_FLAGS.items())
+RED_FLAG_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern, _ in RED_FLAG_TABLE]
+WORD_START_REGEX = re.compile(r"\b\w+")
+
+def _index_red_flags():
+    by_word, anywhere = {}, []
+    for i, (pattern, _) in enumerate(RED_FLAG_TABLE):
+        lead = re.match(r"\\b(\w+)(?: |\\b|\\s)", pattern)
+        if lead:
+            by_word.setdefault(lead.group(1).lower(), []).append(i)
+        else:
+            anywhere.append(i)  # no plain leading word: try it at every word
+    return {word: sorted(ids + anywhere) for word, ids in by_word.items()}, anywhere
+
+RED_FLAG_INDEX, RED_FLAG_ANYWHERE = _index_red_flags()
+
+def iter_red_flag_hits(text):
+    """Yield (flag index, match) for every red flag, overlapping matches included"""
+    for word in WORD_START_REGEX.finditer(text):
+        for idx in RED_FLAG_INDEX.get(word.group().lower(), RED_FLAG_ANYWHERE):
+            match = RED_FLAG_PATTERNS[idx].match(text, word.start())
+            if match:
+                yield idx, match
+
+def iter_red_flags(text, seen=()):
+    """Yield (flag index, match) for non-overlapping red flags in one left-to-right scan
+
+    Flags in seen are skipped before the overlap check, so an already-replaced
+    flag doesn't hide a different flag nested inside it.
+    """
+    end = 0
+    for idx, match in iter_red_flag_hits(text):
+        if idx in seen:
+            continue
+        if match.start() >= end:
+            end = match.end()
+            yield idx, match
+
+def find_red_flags(text):
+    """Return the set of red-flag indices present in text"""
+    return {idx for idx, _ in iter_red_flag_hits(text)}
+
+########################################
+# Compiled Contraction Engine
+########################################
+# All CONTRACTIONS_MAP phrases as one whole-word alternation, so finding every
+# contraction site is a single linear scan instead of one re.sub per entry.
+CONTRACTION_TABLE = list(CONTRACTIONS_MAP.items())
+CONTRACTION_SITE_REGEX = re.compile(
+    r"\b(?:" + "|".join(f"(?P<c{i}>{re.escape(full)})" for i, (full, _) in enumerate(CONTRACTION_TABLE)) + r")\b",
+    re.IGNORECASE
+)
+
+def iter_contractions(text):
+    """Yield (CONTRACTION_TABLE index, match) for every contractible phrase"""
+    for match in CONTRACTION_SITE_REGEX.finditer(text):
+        yield int(match.lastgroup[1:]), match
+
 ########################################
 # Advanced AI Detection (StealthWriter-style)
 ########################################
-def calculate_perplexity_score(text):
+TextAnalysis = namedtuple("TextAnalysis", ["text", "sentences", "words"])
+
+def analyze_text(text):
+    """Tokenize once into the sentences and lowercase words shared by every detection signal"""
+    ensure_nltk_data()
+    sentences = sent_tokenize(text)
+    words = [w for s in sentences for w in word_tokenize(s.lower(), preserve_line=True)]
+    return TextAnalysis(text, sentences, words)
+
+def bigram_entropy(words):
+    """Shannon entropy (bits) of the bigram distribution, computed over integer-encoded tokens"""
+    if len(words) < 2:
+        return 0.0
+    _, ids = np.unique(np.asarray(words), return_inverse=True)
+    ids = ids.astype(np.int64)
+    codes = ids[:-1] * (ids.max() + 1) + ids[1:]
+    counts = np.unique(codes, return_counts=True)[1]
+    probs = counts / codes.size
+    return float(-(probs * np.log2(probs)).sum())
+
+def calculate_perplexity_score(text, words=None):
     """Calculate text perplexity - AI tends to have lower perplexity"""
-    words = word_tokenize(text.lower())
+    if words is None:
+        words = analyze_text(text).words
     if len(words) < 10:
         return 50
     
-    word_freq = Counter(words)
-    unique_ratio = len(word_freq) / len(words)
-    
-    # Calculate bigram entropy
-    bigrams = list(zip(words[:-1], words[1:]))
-    bigram_freq = Counter(bigrams)
-    
-    entropy = 0
-    for bigram in set(bigrams):
-        prob = bigram_freq[bigram] / len(bigrams)
-        entropy -= prob * np.log2(prob) if prob > 0 else 0
-    
     # Normalize (higher entropy = more human-like)
-    perplexity_score = min(entropy * 10, 100)
+    perplexity_score = min(bigram_entropy(words) * 10, 100)
     return perplexity_score
 
 def calculate_burstiness(sentences):
@@ -113,49 +168,59 @@ def calculate_burstiness(sentences):
     burstiness = min(cv * 100, 100)
     return burstiness
 
-def detect_ai_patterns(text):
-    """Detect specific AI writing patterns"""
+FORMAL_TRANSITIONS = ['furthermore', 'moreover', 'additionally', 'consequently', 'nonetheless', 'nevertheless']
+PASSIVE_PATTERNS = ['is being', 'are being', 'was being', 'were being', 'is shown', 'are shown']
+CONTRACTION_REGEX = re.compile(r"\w+n't|\w+'re|\w+'ll|\w+'ve|\w+'d")
+INFORMAL_REGEX = re.compile(r'\b(kinda|gonna|wanna|gotta|sorta|yeah|ok|okay)\b')
+
+def count_ai_patterns(text):
+    """Additive pattern counts for a span of text (red flags keyed by flag index)"""
     text_lower = text.lower()
+    return {
+        'red_flags': Counter(idx for idx, _ in iter_red_flag_hits(text_lower)),
+        'transitions': sum(text_lower.count(t) for t in FORMAL_TRANSITIONS),
+        'passive': sum(text_lower.count(p) for p in PASSIVE_PATTERNS),
+        'contractions': len(CONTRACTION_REGEX.findall(text)),
+        'informal': len(INFORMAL_REGEX.findall(text_lower)),
+    }
+
+def score_ai_patterns(red_flags, transitions, passive, contractions, informal, sentence_count):
+    """Turn pattern counts into the 0-50 pattern score"""
     score = 0
     
-    # AI red flags from your list
-    for pattern, _ in AI_RED_FLAGS.items():
-        if re.search(pattern, text_lower):
-            score += 3
+    # AI red flags from your list (distinct flags present)
+    score += red_flags * 3
     
     # Formal transition overuse
-    formal_transitions = ['furthermore', 'moreover', 'additionally', 'consequently', 'nonetheless', 'nevertheless']
-    score += sum(text_lower.count(t) for t in formal_transitions) * 4
+    score += transitions * 4
     
     # Passive voice detection
-    passive_indicators = ['is being', 'are being', 'was being', 'were being', 'is shown', 'are shown']
-    score += sum(text_lower.count(p) for p in passive_indicators) * 3
+    score += passive * 3
     
     # Lack of contractions
-    sentences = sent_tokenize(text)
-    contraction_ratio = len(re.findall(r"\w+n't|\w+'re|\w+'ll|\w+'ve|\w+'d", text)) / max(len(sentences), 1)
+    contraction_ratio = contractions / max(sentence_count, 1)
     if contraction_ratio < 0.15:
         score += 15
     
     # Perfect grammar (too perfect)
-    if not re.search(r'\b(kinda|gonna|wanna|gotta|sorta|yeah|ok|okay)\b', text_lower):
+    if not informal:
         score += 8
     
     return min(score, 50)
 
-def calculate_ai_probability(text):
-    """Advanced AI detection combining multiple signals"""
-    if not text.strip():
-        return 0
-    
-    sentences = sent_tokenize(text)
-    
-    # Multiple detection methods
-    perplexity = calculate_perplexity_score(text)
-    burstiness = calculate_burstiness(sentences)
-    pattern_score = detect_ai_patterns(text)
-    
-    # Weight different signals
+def detect_ai_patterns(text, sentences=None):
+    """Detect specific AI writing patterns"""
+    if sentences is None:
+        ensure_nltk_data()
+        sentences = sent_tokenize(text)
+    counts = count_ai_patterns(text)
+    return score_ai_patterns(
+        len(counts['red_flags']), counts['transitions'], counts['passive'],
+        counts['contractions'], counts['informal'], len(sentences)
+    )
+
+def combine_ai_signals(perplexity, burstiness, pattern_score):
+    """Weight the individual signals into the final 0-100 AI probability"""
     # Lower perplexity = more AI-like (invert for score)
     perplexity_component = (100 - perplexity) * 0.3
     
@@ -169,41 +234,207 @@ def calculate_ai_probability(text):
     
     return max(0, min(100, final_score))
 
+@instrumented("calculate_ai_probability")
+def calculate_ai_probability(text):
+    """Advanced AI detection combining multiple signals"""
+    if not text.strip():
+        return 0
+    
+    # Tokenize once; every signal reads the shared analysis
+    analysis = analyze_text(text)
+    
+    # Multiple detection methods
+    perplexity = calculate_perplexity_score(text, analysis.words)
+    burstiness = calculate_burstiness(analysis.sentences)
+    pattern_score = detect_ai_patterns(text, analysis.sentences)
+    
+    return combine_ai_signals(perplexity, burstiness, pattern_score)
+
+########################################
+# Incremental AI Scoring
+########################################
+PARAGRAPH_REGEX = re.compile(r'\n\s*\n')
+
+def _xlogx(count):
+    return count * math.log2(count) if count > 0 else 0.0
+
+class ParagraphStats:
+    """Per-paragraph statistics the incremental scorer adds and subtracts"""
+
+    def __init__(self, text):
+        analysis = analyze_text(text)
+        self.text = text
+        self.lengths = [len(s.split()) for s in analysis.sentences]
+        self.first_word = analysis.words[0] if analysis.words else None
+        self.last_word = analysis.words[-1] if analysis.words else None
+        self.word_count = len(analysis.words)
+        self.bigrams = Counter(zip(analysis.words[:-1], analysis.words[1:]))
+        self.patterns = count_ai_patterns(text)
+
+class IncrementalScorer:
+    """
+    Keeps paragraph-level statistics so re-scoring edited text only re-analyzes
+    the paragraphs that changed. score() mirrors calculate_ai_probability, except
+    that sentences never span a blank line.
+    """
+
+    def __init__(self):
+        self.paragraphs = []
+        self.sentence_count = 0
+        self.length_sum = 0
+        self.length_sq_sum = 0
+        self.word_count = 0
+        self.bigrams = Counter()
+        self.bigram_total = 0
+        self.bigram_xlogx = 0.0
+        self.red_flags = Counter()
+        self.pattern_totals = Counter()
+
+    def _add_bigram(self, bigram, delta):
+        old = self.bigrams[bigram]
+        new = old + delta
+        self.bigram_xlogx += _xlogx(new) - _xlogx(old)
+        self.bigram_total += delta
+        if new:
+            self.bigrams[bigram] = new
+        else:
+            del self.bigrams[bigram]
+
+    def _apply(self, stats, sign):
+        self.sentence_count += sign * len(stats.lengths)
+        self.length_sum += sign * sum(stats.lengths)
+        self.length_sq_sum += sign * sum(n * n for n in stats.lengths)
+        self.word_count += sign * stats.word_count
+        for bigram, count in stats.bigrams.items():
+            self._add_bigram(bigram, sign * count)
+        for idx, count in stats.patterns['red_flags'].items():
+            self.red_flags[idx] += sign * count
+            if not self.red_flags[idx]:
+                del self.red_flags[idx]
+        for key in ('transitions', 'passive', 'contractions', 'informal'):
+            self.pattern_totals[key] += sign * stats.patterns[key]
+
+    def _apply_boundaries(self, paragraphs, sign):
+        # Bigrams that straddle two consecutive non-empty paragraphs
+        words = [p for p in paragraphs if p is not None and p.word_count]
+        for prev, nxt in zip(words[:-1], words[1:]):
+            self._add_bigram((prev.last_word, nxt.first_word), sign)
+
+    def update(self, text):
+        """Re-score text, re-analyzing only paragraphs that differ from the last call"""
+        texts = [p for p in PARAGRAPH_REGEX.split(text) if p.strip()]
+        old = self.paragraphs
+        
+        # Unchanged prefix and suffix are reused as-is
+        prefix = 0
+        while prefix < min(len(old), len(texts)) and old[prefix].text == texts[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < min(len(old), len(texts)) - prefix and
+               old[-1 - suffix].text == texts[-1 - suffix]):
+            suffix += 1
+        
+        removed = old[prefix:len(old) - suffix]
+        added = [ParagraphStats(t) for t in texts[prefix:len(texts) - suffix]]
+        before = old[prefix - 1] if prefix else None
+        after = old[len(old) - suffix] if suffix else None
+        
+        if removed or added:
+            self._apply_boundaries([before] + removed + [after], -1)
+            for stats in removed:
+                self._apply(stats, -1)
+            for stats in added:
+                self._apply(stats, 1)
+            self._apply_boundaries([before] + added + [after], 1)
+            self.paragraphs = old[:prefix] + added + old[len(old) - suffix:]
+        
+        return self.score()
+
+    def score(self):
+        """Aggregate AI probability from the running statistics"""
+        if not self.paragraphs:
+            return 0
+        
+        if self.word_count < 10:
+            perplexity = 50
+        else:
+            entropy = math.log2(self.bigram_total) - self.bigram_xlogx / self.bigram_total
+            perplexity = min(entropy * 10, 100)
+        
+        if self.sentence_count < 3:
+            burstiness = 50
+        else:
+            mean_len = self.length_sum / self.sentence_count
+            variance = max(self.length_sq_sum / self.sentence_count - mean_len ** 2, 0)
+            cv = (math.sqrt(variance) / mean_len) if mean_len > 0 else 0
+            burstiness = min(cv * 100, 100)
+        
+        totals = self.pattern_totals
+        pattern_score = score_ai_patterns(
+            len(self.red_flags), totals['transitions'], totals['passive'],
+            totals['contractions'], totals['informal'], self.sentence_count
+        )
+        
+        return combine_ai_signals(perplexity, burstiness, pattern_score)
+
 ########################################
 # Core Humanization Engine
 ########################################
-def get_smart_synonym(word, pos, context='academic'):
-    """Get contextually appropriate synonym from your comprehensive lists"""
-    word_lower = word.lower()
-    
-    # Preserve critical words
-    if word_lower in PRESERVE_WORDS:
-        return None
-    
-    # Use your ultra-comprehensive synonym database
-    if word_lower in ULTRA_SYNONYMS:
-        synonyms = ULTRA_SYNONYMS[word_lower]
-        if synonyms:
-            return random.choice(synonyms)
-    
-    return None
-
-def remove_ai_red_flags(text):
-    """Remove/replace AI-flagged phrases from your list"""
-    for pattern, replacements in AI_RED_FLAGS.items():
-        if re.search(pattern, text, re.IGNORECASE):
-            replacement = random.choice(replacements)
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE, count=1)
-    return text
+def get_smart_synonym(word, pos, context='academic', rng=random):
+    """Get contextually appropriate synonym from the precompiled synonym index"""
+    # Preserve words are already excluded and candidates filtered by POS
+    return get_synonym_index().choose(word, pos, rng=rng)
 
-def apply_contractions(text, ratio=0.4):
-    """Add natural contractions"""
-    for full, contracted in CONTRACTIONS_MAP.items():
-        if random.random() < ratio:
-            text = re.sub(r'\b' + re.escape(full) + r'\b', contracted, text, count=1, flags=re.IGNORECASE)
-    return text
+def remove_ai_red_flags(text, rng=random, seen=None):
+    """Remove/replace AI-flagged phrases from your list (first occurrence of each flag)
+
+    seen, if given, is the set of flag indices already replaced earlier in the
+    document; it is updated in place so chunked callers keep "first occurrence".
+    """
+    parts = []
+    last = 0
+    seen = set() if seen is None else seen
+    for idx, match in iter_red_flags(text, seen):
+        seen.add(idx)
+        parts.append(text[last:match.start()])
+        parts.append(rng.choice(RED_FLAG_TABLE[idx][1]))
+        last = match.end()
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return "".join(parts)
+
+def apply_contractions(text, ratio=0.4, first_only=True, rng=random, decided=None):
+    """Add natural contractions in one scan over the text
+
+    Each candidate site is contracted with probability ratio. With first_only
+    (the default) that choice is made once per distinct phrase and only its
+    first occurrence can change; otherwise every site is sampled independently.
+    decided carries the first_only choices across chunks of one document.
+    """
+    parts = []
+    last = 0
+    decided = {} if decided is None else decided
+    for idx, match in iter_contractions(text):
+        if first_only:
+            if idx in decided:
+                continue
+            decided[idx] = True
+        if rng.random() >= ratio:
+            continue
+        contracted = CONTRACTION_TABLE[idx][1]
+        # Keep a sentence-initial capital ("Do not" -> "Don't")
+        if match.group(0)[0].isupper():
+            contracted = contracted[0].upper() + contracted[1:]
+        parts.append(text[last:match.start()])
+        parts.append(contracted)
+        last = match.end()
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return "".join(parts)
 
-def add_sentence_variety(sentences):
+def add_sentence_variety(sentences, rng=random):
     """Create varied sentence structures and lengths"""
     varied = []
     i = 0
@@ -213,16 +444,16 @@ def add_sentence_variety(sentences):
         words = sent.split()
         
         # Randomly vary structure
-        if len(words) > 15 and random.random() < 0.3:
+        if len(words) > 15 and rng.random() < 0.3:
             # Split long sentence
             mid = len(words) // 2
             part1 = ' '.join(words[:mid]) + '.'
             part2 = ' '.join(words[mid:])
             part2 = part2[0].upper() + part2[1:] if len(part2) > 1 else part2
             varied.extend([part1, part2])
-        elif len(words) < 8 and i < len(sentences) - 1 and len(sentences[i+1].split()) < 8 and random.random() < 0.25:
+        elif len(words) < 8 and i < len(sentences) - 1 and len(sentences[i+1].split()) < 8 and rng.random() < 0.25:
             # Combine short sentences
-            connector = random.choice([', and', ', but', ', while', ' -'])
+            connector = rng.choice([', and', ', but', ', while', ' -'])
             combined = sent.rstrip('.') + connector + ' ' + sentences[i+1][0].lower() + sentences[i+1][1:]
             varied.append(combined)
             i += 1  # Skip next sentence
@@ -233,22 +464,26 @@ def add_sentence_variety(sentences):
     
     return varied
 
-def add_natural_transitions(sentences):
-    """Add varied transitions from your comprehensive lists"""
+def add_natural_transitions(sentences, rng=random, document_start=True):
+    """Add varied transitions from your comprehensive lists
+
+    document_start=False means sentences continue an earlier chunk, so the
+    first one may get a transition too.
+    """
     result = []
     
     for i, sent in enumerate(sentences):
         # Don't add transition to first sentence
-        if i == 0:
+        if i == 0 and document_start:
             result.append(sent)
             continue
         
         # Random transition addition
-        if random.random() < 0.25:
+        if rng.random() < 0.25:
             # Choose transition type based on context
             transition_types = list(DIVERSE_STARTERS.keys())
-            trans_type = random.choice(transition_types)
-            transition = random.choice(DIVERSE_STARTERS[trans_type])
+            trans_type = rng.choice(transition_types)
+            transition = rng.choice(DIVERSE_STARTERS[trans_type])
             
             # Don't add if sentence already has transition
             first_words = sent.split()[:2]
@@ -259,55 +494,105 @@ def add_natural_transitions(sentences):
     
     return result
 
-def strategic_synonym_replacement(text, strength=0.3):
-    """Replace words with synonyms from your ultra-comprehensive database"""
+SYNONYM_CHUNK_CHARS = 2000
+SYNONYM_BATCH_SIZE = 32
+SYNONYM_PARALLEL_MIN_CHUNKS = 16
+# Upper bound for n_process=None. spaCy would start these processes on every call, so
+# the default stays in-process; set HUMANIZER_SYNONYM_PROCESSES for one-off batch jobs
+SYNONYM_MAX_PROCESSES = int(os.environ.get("HUMANIZER_SYNONYM_PROCESSES", 1))
+SENTENCE_GAP_REGEX = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+def chunk_text(text, max_chars=SYNONYM_CHUNK_CHARS):
+    """Split text at sentence/paragraph gaps into (chunk, separator) pairs of ~max_chars"""
+    chunks = []
+    start = 0
+    for gap in SENTENCE_GAP_REGEX.finditer(text):
+        if gap.start() - start >= max_chars:
+            chunks.append((text[start:gap.start()], gap.group(0)))
+            start = gap.end()
+    chunks.append((text[start:], ""))
+    return chunks
+
+def strategic_synonym_replacement(text, strength=0.3, batch_size=SYNONYM_BATCH_SIZE, n_process=None, rng=random):
+    """Replace words with synonyms from your ultra-comprehensive database
+
+    Large inputs are cut into sentence-aligned chunks and parsed with nlp.pipe.
+    n_process=None uses up to SYNONYM_MAX_PROCESSES once there are enough chunks.
+    """
+    nlp = load_spacy_model()
     if not nlp:
         return text
     
-    doc = nlp(text)
+    index = get_synonym_index()
+    # Vectorized draws use a NumPy generator seeded from rng, so seeded runs stay reproducible
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    chunks = chunk_text(text)
+    if n_process is None:
+        n_process = min(SYNONYM_MAX_PROCESSES, len(chunks)) if len(chunks) >= SYNONYM_PARALLEL_MIN_CHUNKS else 1
+    
+    # Parse everything first: the cap is a sixth of the whole text's tokens, as in
+    # the old single-doc pass, not of the tokens seen so far
+    docs = list(nlp.pipe((chunk for chunk, _ in chunks), batch_size=batch_size, n_process=n_process))
+    max_replacements = max(2, sum(len(doc) for doc in docs) // 6)
     tokens = []
     replace_count = 0
-    max_replacements = max(2, len(doc) // 6)
     
-    for token in doc:
-        # Skip special cases
-        if token.is_punct or token.is_stop or "[[REF_" in token.text or len(token.text) < 4:
-            tokens.append(token.text_with_ws)
-            continue
-        
-        # Strategic replacement
-        if (token.pos_ in ["ADJ", "VERB", "NOUN", "ADV"] and 
-            replace_count < max_replacements and 
-            random.random() < strength):
+    for doc, (_, separator) in zip(docs, chunks):
+
+        # Collect this chunk's replacement slots, then draw all synonyms at once
+        doc_tokens = []
+        slots = []
+        for token in doc:
+            doc_tokens.append(token.text_with_ws)
+            # Skip special cases
+            if token.is_punct or token.is_stop or "[[REF_" in token.text or len(token.text) < 4:
+                continue
             
-            synonym = get_smart_synonym(token.text, token.pos_)
-            if synonym:
-                # Preserve capitalization
-                if token.text[0].isupper():
-                    synonym = synonym.capitalize()
-                tokens.append(synonym + token.whitespace_)
+            # Strategic replacement
+            if (token.pos_ in ["ADJ", "VERB", "NOUN", "ADV"] and 
+                replace_count < max_replacements and 
+                rng.random() < strength and
+                index.has(token.text, token.pos_)):
+                slots.append((len(doc_tokens) - 1, token))
                 replace_count += 1
-            else:
-                tokens.append(token.text_with_ws)
-        else:
-            tokens.append(token.text_with_ws)
+        
+        synonyms = index.sample([t.text for _, t in slots], [t.pos_ for _, t in slots], rng=np_rng)
+        for (position, token), synonym in zip(slots, synonyms):
+            # Preserve capitalization
+            if token.text[0].isupper():
+                synonym = synonym.capitalize()
+            doc_tokens[position] = synonym + token.whitespace_
+        tokens.extend(doc_tokens)
+        tokens.append(separator)
     
     return "".join(tokens)
 
-def add_human_imperfections(text):
-    """Add subtle human-like imperfections"""
+def add_human_imperfections(text, rng=random, decided=None):
+    """Add subtle human-like imperfections
+
+    decided, if given, collects the choices already made earlier in the document
+    (informal patterns seen, whether a filler was considered) so chunked callers
+    keep the whole-document rates.
+    """
+    decided = set() if decided is None else decided
     # Occasionally use informal replacements from your list
     for pattern, replacements in INFORMAL_REPLACEMENTS.items():
-        if re.search(pattern, text) and random.random() < 0.2:
-            replacement = random.choice(replacements)
+        if pattern in decided or not re.search(pattern, text):
+            continue
+        decided.add(pattern)
+        if rng.random() < 0.2:
+            replacement = rng.choice(replacements)
             text = re.sub(pattern, replacement, text, count=1, flags=re.IGNORECASE)
     
     # Rarely add filler words
-    if random.random() < 0.15:
-        filler = random.choice(HUMAN_FILLERS)
+    if "filler" in decided:
+        return text
+    decided.add("filler")
+    if rng.random() < 0.15:
+        filler = rng.choice(HUMAN_FILLERS)
         sentences = sent_tokenize(text)
         if sentences:
-            idx = random.randint(0, len(sentences) - 1)
+            idx = rng.randint(0, len(sentences) - 1)
             sentences[idx] = sentences[idx].replace('. ', f', {filler}, ', 1)
             text = ' '.join(sentences)
     
@@ -316,50 +601,231 @@ def add_human_imperfections(text):
 ########################################
 # Main Humanization Pipeline
 ########################################
-def advanced_humanize(text, strength=3):
-    """StealthWriter-level humanization pipeline"""
+HUMANIZE_STAGES = {
+    'red_flags': "Removing AI red flags",
+    'variety': "Varying sentence structure",
+    'transitions': "Adding natural transitions",
+    'synonyms': "Replacing synonyms",
+    'contractions': "Adding contractions",
+    'imperfections': "Adding human imperfections",
+}
+
+@instrumented("advanced_humanize")
+def advanced_humanize(text, strength=3, progress=None, seed=None, rng=None):
+    """StealthWriter-level humanization pipeline
+
+    progress, if given, is called as progress(stage, fraction) after each
+    stage in HUMANIZE_STAGES finishes. All randomness comes from rng, or a
+    private random.Random(seed) per call, so equal (text, strength, seed)
+    always give the same output and concurrent calls don't share a stream.
+    """
+    ensure_nltk_data()
+    if rng is None:
+        rng = random.Random(seed)
+    stages = list(HUMANIZE_STAGES)
+    
+    def report(stage):
+        if progress:
+            progress(stage, (stages.index(stage) + 1) / len(stages))
     
     # Strength mapping
     syn_strength = 0.15 + (strength * 0.1)
     
     # Extract citations
-    text, citations = extract_citations(text)
+    with stage("humanize.citations", len(text)):
+        text, citations = extract_citations(text)
     
     # Step 1: Remove AI red flags
-    text = remove_ai_red_flags(text)
+    with stage("humanize.red_flags", len(text)):
+        text = remove_ai_red_flags(text, rng=rng)
+    report('red_flags')
     
     # Step 2: Split into sentences
-    sentences = sent_tokenize(text)
+    with stage("humanize.sentence_split", len(text)):
+        sentences = sent_tokenize(text)
     
     # Step 3: Add sentence variety
-    sentences = add_sentence_variety(sentences)
+    with stage("humanize.variety", len(text)):
+        sentences = add_sentence_variety(sentences, rng=rng)
+    report('variety')
     
     # Step 4: Add natural transitions
-    sentences = add_natural_transitions(sentences)
+    with stage("humanize.transitions", len(text)):
+        sentences = add_natural_transitions(sentences, rng=rng)
+    report('transitions')
     
     # Step 5: Join and apply synonym replacement
     text = ' '.join(sentences)
-    text = strategic_synonym_replacement(text, syn_strength)
+    with stage("humanize.synonyms", len(text)):
+        text = strategic_synonym_replacement(text, syn_strength, rng=rng)
+    report('synonyms')
     
     # Step 6: Add contractions
-    text = apply_contractions(text, ratio=0.35)
+    with stage("humanize.contractions", len(text)):
+        text = apply_contractions(text, ratio=0.35, rng=rng)
+    report('contractions')
     
     # Step 7: Add human imperfections
-    text = add_human_imperfections(text)
-    
-    # Step 8: Clean up
-    text = re.sub(r'\s+([.,;:!?])', r'\1', text)
-    text = re.sub(r'\s{2,}', ' ', text)
+    with stage("humanize.imperfections", len(text)):
+        text = add_human_imperfections(text, rng=rng)
+    report('imperfections')
     
-    # Step 9: Restore citations
-    text = restore_citations(text, citations)
+    # Step 8: Clean up, then Step 9: restore citations
+    with stage("humanize.cleanup_restore", len(text)):
+        text = re.sub(r'\s+([.,;:!?])', r'\1', text)
+        text = re.sub(r'\s{2,}', ' ', text)
+        text = restore_citations(text, citations)
     
     return text
 
+########################################
+# Chunked Humanization (bounded memory)
+########################################
+HUMANIZE_WINDOW_CHARS = 8000
+# Inputs at least this long are humanized window by window in the UI
+HUMANIZE_CHUNKED_MIN_CHARS = 50000
+
+def iter_paragraphs(source):
+    """Paragraphs of a string, or of an iterable of lines (e.g. an open file) read lazily"""
+    if isinstance(source, str):
+        start = 0
+        for gap in PARAGRAPH_REGEX.finditer(source):
+            yield source[start:gap.start()]
+            start = gap.end()
+        yield source[start:]
+        return
+    lines = []
+    for line in source:
+        if line.strip():
+            lines.append(line)
+        elif lines:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+def iter_text_windows(source, window_chars=HUMANIZE_WINDOW_CHARS):
+    """Group paragraphs into windows of about window_chars; oversized paragraphs are cut at sentence gaps"""
+    window = []
+    size = 0
+    for paragraph in iter_paragraphs(source):
+        if not paragraph.strip():
+            continue
+        pieces = [chunk for chunk, _ in chunk_text(paragraph, window_chars)] if len(paragraph) > window_chars else [paragraph]
+        for piece in pieces:
+            window.append(piece)
+            size += len(piece)
+            if size >= window_chars:
+                yield "\n\n".join(window)
+                window = []
+                size = 0
+    if window:
+        yield "\n\n".join(window)
+
+def iter_humanize(source, strength=3, seed=None, rng=None, window_chars=HUMANIZE_WINDOW_CHARS, progress=None):
+    """
+    advanced_humanize for book-length input: yields the output window by window.
+
+    source is a string or an iterable of lines. Only one window of text, its
+    sentences and its spaCy Doc are alive at a time. Across windows we carry just
+    what the pipeline needs: the last sentence (held back so it can still be
+    combined with the next window's first), which red flags, contractions and
+    informal patterns were already decided, and whether the document has started.
+    Joining the yielded pieces gives the full text. progress, if given, is called
+    as progress("window", fraction) after each window, like advanced_humanize;
+    fraction is the share of input characters consumed, or None when source is
+    an iterable of lines of unknown length.
+    """
+    ensure_nltk_data()
+    if rng is None:
+        rng = random.Random(seed)
+    syn_strength = 0.15 + (strength * 0.1)
+    seen_flags = set()
+    contractions_decided = {}
+    imperfections_decided = set()
+    document_start = True
+    carry = None
+    consumed = 0
+    total = len(source) if isinstance(source, str) else None
+    
+    def report(consumed):
+        if progress:
+            progress("window", min(consumed / total, 1.0) if total else None)
+    
+    def humanize_window(sentences, citations):
+        nonlocal document_start
+        sentences = add_sentence_variety(sentences, rng=rng)
+        sentences = add_natural_transitions(sentences, rng=rng, document_start=document_start)
+        text = strategic_synonym_replacement(' '.join(sentences), syn_strength, rng=rng)
+        text = apply_contractions(text, ratio=0.35, rng=rng, decided=contractions_decided)
+        text = add_human_imperfections(text, rng=rng, decided=imperfections_decided)
+        text = re.sub(r'\s+([.,;:!?])', r'\1', text)
+        text = re.sub(r'\s{2,}', ' ', text).strip()
+        text = restore_citations(text, citations)
+        piece = text if document_start else ' ' + text
+        document_start = False
+        return piece
+    
+    for window in iter_text_windows(source, window_chars):
+        with stage("humanize.window", len(window)):
+            consumed += len(window)
+            # Red flags are removed from the new window only: the carried sentence
+            # already went through that pass with the previous window
+            text, citations = extract_citations(window)
+            window = restore_citations(remove_ai_red_flags(text, rng=rng, seen=seen_flags), citations)
+            if carry is not None:
+                window = carry + ' ' + window
+            text, citations = extract_citations(window)
+            sentences = sent_tokenize(text)
+            carry = restore_citations(sentences.pop(), citations) if sentences else None
+            piece = humanize_window(sentences, citations) if sentences else None
+        if piece:
+            yield piece
+        report(consumed)
+    
+    if carry is not None:
+        text, citations = extract_citations(carry)
+        yield humanize_window([text], citations)
+        report(consumed)
+
+########################################
+# Result Cache
+########################################
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 60 * 60 * 24
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide result cache; set HUMANIZER_CACHE_PATH to persist it in SQLite."""
+    return ResultCache(
+        maxsize=RESULT_CACHE_SIZE,
+        ttl=RESULT_CACHE_TTL,
+        path=os.environ.get("HUMANIZER_CACHE_PATH")
+    )
+
+def cached_humanize(text, strength=3, seed=None, progress=None):
+    """
+    advanced_humanize, memoized by hash of (text, strength, seed); progress only
+    fires on a miss. Unseeded runs are random by design and are never cached.
+    """
+    if seed is None:
+        return advanced_humanize(text, strength=strength, progress=progress)
+    key = make_key("humanize", text, strength, seed)
+    return get_result_cache().get_or_compute(
+        key, lambda: advanced_humanize(text, strength=strength, progress=progress, seed=seed)
+    )
+
+def cached_ai_probability(text):
+    """calculate_ai_probability, memoized by content hash (for the API and CLI workers)"""
+    key = make_key("ai_probability", text)
+    return get_result_cache().get_or_compute(key, lambda: calculate_ai_probability(text))
+
 ########################################
 # Streamlit UI
 ########################################
 def show_humanize_page():
+    ensure_nltk_data()
+    
     # Custom CSS (keeping your existing styling)
     st.markdown("""
         <style>
@@ -412,6 +878,14 @@ def show_humanize_page():
         st.session_state.humanized_ai_score = 0
     if 'show_results' not in st.session_state:
         st.session_state.show_results = False
+    if 'ai_scorer' not in st.session_state:
+        st.session_state.ai_scorer = IncrementalScorer()
+    if 'output_scorer' not in st.session_state:
+        # Same scorer as the input, so Before and After split sentences the same way
+        st.session_state.output_scorer = IncrementalScorer()
+    if 'session_seed' not in st.session_state:
+        # Used when the seed field is blank: stable within a session, so resubmits hit the cache
+        st.session_state.session_seed = random.getrandbits(32)
 
     # Settings
     with st.expander("⚙️ Advanced Settings", expanded=False):
@@ -422,6 +896,30 @@ def show_humanize_page():
             value=3,
             help="Higher = more aggressive transformation"
         )
+        
+        seed_text = st.text_input(
+            "🎲 Seed",
+            value="",
+            help="Same text, strength and seed give the same output; leave blank to use this session's seed"
+        ).strip()
+        seed = st.session_state.session_seed
+        if seed_text:
+            try:
+                seed = int(seed_text)
+            except ValueError:
+                st.warning(f"⚠️ Seed must be a whole number; using this session's seed ({seed}) instead.")
+
+        show_timings = st.checkbox(
+            "🔬 Show stage timings",
+            value=False,
+            help="Break the next humanize run down by stage: wall/CPU time, input size and peak memory"
+        )
+        
+        cache_stats = get_result_cache().stats()
+        st.caption(
+            f"🗄️ Result cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+            f"{cache_stats['size']}/{cache_stats['maxsize']} entries"
+        )
 
     # Main UI
     col1, col2 = st.columns([1, 1], gap="large")
@@ -458,8 +956,7 @@ def show_humanize_page():
 
         if check_ai and input_text.strip():
             with st.spinner("Analyzing with advanced AI detection..."):
-                time.sleep(1)
-                ai_score = calculate_ai_probability(input_text)
+                ai_score = st.session_state.ai_scorer.update(input_text)
                 st.session_state.original_ai_score = ai_score
                 
             st.markdown("---")
@@ -481,17 +978,37 @@ def show_humanize_page():
         if humanize and input_text.strip():
             st.session_state.input_text = input_text
             
-            with st.spinner("🔄 Humanizing with advanced engine..."):
-                time.sleep(1.5)
-                
-                st.session_state.original_ai_score = calculate_ai_probability(input_text)
-                
-                # Advanced humanization
-                humanized = advanced_humanize(input_text, strength=strength)
+            progress_bar = st.progress(0.0, text="🔄 Scoring input...")
+            
+            def report_progress(stage, fraction):
+                if stage == "window":
+                    label = f"Humanized {fraction:.0%} of the text"
+                else:
+                    label = HUMANIZE_STAGES[stage]
+                progress_bar.progress(fraction, text=f"🔄 {label}...")
+            
+            st.session_state.original_ai_score = st.session_state.ai_scorer.update(input_text)
+            
+            # Advanced humanization
+            with capture(memory=show_timings) as stage_records:
+                if len(input_text) >= HUMANIZE_CHUNKED_MIN_CHARS:
+                    # Book-length input: humanize window by window and show output as it arrives
+                    preview = st.empty()
+                    parts = []
+                    for piece in iter_humanize(input_text, strength=strength, seed=seed, progress=report_progress):
+                        parts.append(piece)
+                        preview.caption(f"…{piece[-300:]}")
+                    preview.empty()
+                    humanized = "".join(parts)
+                else:
+                    humanized = cached_humanize(input_text, strength=strength, seed=seed, progress=report_progress)
                 
+                progress_bar.progress(1.0, text="🔄 Scoring output...")
                 st.session_state.humanized_text = humanized
-                st.session_state.humanized_ai_score = calculate_ai_probability(humanized)
-                st.session_state.show_results = True
+                st.session_state.humanized_ai_score = st.session_state.output_scorer.update(humanized)
+            st.session_state.stage_records = stage_records
+            progress_bar.empty()
+            st.session_state.show_results = True
         
         if st.session_state.show_results and st.session_state.humanized_text:
             st.text_area(
@@ -532,6 +1049,35 @@ def show_humanize_page():
                 use_container_width=True,
                 type="primary"
             )
+            
+            if show_timings and st.session_state.get('stage_records'):
+                with st.expander("🔬 Stage timings", expanded=True):
+                    st.table([
+                        {
+                            "Stage": "  " * record["depth"] + record["stage"],
+                            "Wall (ms)": round(record["wall_seconds"] * 1000, 1),
+                            "CPU (ms)": round(record["cpu_seconds"] * 1000, 1),
+                            "Input size": record["size"],
+                            "Peak (KiB)": None if record["peak_bytes"] is None else round(record["peak_bytes"] / 1024, 1),
+                        }
+                        for record in st.session_state.stage_records
+                    ])
+                    if not any(r["stage"].startswith(("advanced_humanize", "humanize.")) for r in st.session_state.stage_records):
+                        st.caption("Humanized text came from the result cache, so only scoring ran.")
+                    totals = stage_summary()
+                    if totals:
+                        st.markdown("**Since this process started**")
+                        st.table([
+                            {
+                                "Stage": name,
+                                "Calls": entry["count"],
+                                "Mean wall (ms)": round(entry["mean_wall_seconds"] * 1000, 1),
+                                "p50 (s)": entry["p50_seconds"],
+                                "p95 (s)": entry["p95_seconds"],
+                                "Max peak (KiB)": None if entry["max_peak_bytes"] is None else round(entry["max_peak_bytes"] / 1024, 1),
+                            }
+                            for name, entry in sorted(totals.items())
+                        ])
         else:
             st.text_area(
                 "Result",
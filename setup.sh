@@ -10,5 +10,5 @@ python -m spacy download en_core_web_sm
 python -m nltk.downloader all
 
 
-echo "Downloading NLTK data..."
-python -c "import nltk; nltk.download('punkt_tab', quiet=True); nltk.download('punkt', quiet=True); nltk.download('wordnet', quiet=True); nltk.download('averaged_perceptron_tagger', quiet=True)"
\ No newline at end of file
+echo "Warming up NLTK data and spaCy model..."
+python -m utils.resources
\ No newline at end of file
@@ -1,47 +1,132 @@
-import nltk
+import os
+import threading
+import torch
 from nltk.tokenize import sent_tokenize
-from utils.model_loaders import load_detector_model
+from utils.instrumentation import instrumented, stage
+from utils.model_loaders import DETECTOR_MODEL, load_detector_model, pipeline_backend
+from utils.resources import ensure_nltk_data
+from utils.result_cache import ResultCache, make_key
 
-nltk.download('punkt', quiet=True)
+DETECTOR_BATCH_SIZE = 32
+DETECTOR_CACHE_SIZE = 20000
+# Set to a file path to keep sentence results across restarts (SQLite)
+DETECTOR_CACHE_PATH = os.environ.get("HUMANIZER_DETECTOR_CACHE_PATH")
 
-def classify_text_hf(text, threshold=0.8):
+LABELS = (
+    "AI-generated",
+    "AI-generated & AI-refined",
+    "Human-written",
+    "Human-written & AI-refined"
+)
+
+def run_detector(detector, sentences, batch_size=DETECTOR_BATCH_SIZE):
+    """
+    Run the detector over length-sorted batches, so each batch pads to similar
+    lengths, and return the results in the original sentence order.
+    """
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+    results = [None] * len(sentences)
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            outputs = detector([sentences[i] for i in batch], truncation=True, batch_size=batch_size)
+            for i, output in zip(batch, outputs):
+                results[i] = output
+    return results
+
+########################################
+# Sentence result cache
+########################################
+_detector_cache = None
+_detector_cache_lock = threading.Lock()
+
+def get_detector_cache():
+    """Process-wide sentence -> raw detector result cache (LRU, optional SQLite tier)."""
+    global _detector_cache
+    with _detector_cache_lock:
+        if _detector_cache is None:
+            _detector_cache = ResultCache(maxsize=DETECTOR_CACHE_SIZE, path=DETECTOR_CACHE_PATH)
+        return _detector_cache
+
+def normalize_sentence(sentence):
+    """Collapse whitespace so reflowed copies of a sentence share one cache entry."""
+    return " ".join(sentence.split())
+
+def detector_cache_key(sentence, backend, model=DETECTOR_MODEL):
+    """Key for a sentence's result from the detector as built on backend."""
+    return make_key("detector", model, backend, normalize_sentence(sentence))
+
+def detect_sentences(sentences, batch_size=DETECTOR_BATCH_SIZE, batcher=None, detector=None, cache=None):
+    """
+    Raw detector results ({"label", "score"}) for sentences, in order. Cached
+    sentences are answered from the cache; only the distinct misses go to the
+    model (through batcher if given), and their results are stored under the
+    backend the detector was actually built with.
+    """
+    cache = get_detector_cache() if cache is None else cache
+    if detector is None:
+        # Shared registry instance, so this only builds the model once per process
+        detector = batcher.loader() if batcher is not None else load_detector_model()
+    backend = pipeline_backend(detector)
+    keys = [detector_cache_key(sentence, backend) for sentence in sentences]
+    results = cache.get_many(keys)
+    misses = {}
+    for key, sentence in zip(keys, sentences):
+        if key not in results:
+            misses.setdefault(key, sentence)
+
+    if misses:
+        pending = list(misses.values())
+        with stage("detector.model", len(pending)):
+            if batcher is not None:
+                outputs = batcher.classify(pending)
+            else:
+                outputs = run_detector(detector, pending, batch_size)
+        fresh = {
+            key: {"label": output["label"], "score": float(output["score"])}
+            for key, output in zip(misses, outputs)
+        }
+        cache.set_many(fresh.items())
+        results.update(fresh)
+    return [results[key] for key in keys]
+
+def label_for(result, threshold=0.8):
+    """Map a raw FAKE/REAL detector result onto the four reporting categories."""
+    label = result['label'].upper()  # "FAKE" or "REAL"
+    score = result['score']
+    if label == "FAKE":
+        return "AI-generated" if score >= threshold else "AI-generated & AI-refined"
+    if label == "REAL":
+        return "Human-written" if score >= threshold else "Human-written & AI-refined"
+    return "Human-written"
+
+def label_percentages(counts):
+    """Turn per-label sentence counts into rounded percentages."""
+    total = sum(counts.values())
+    return {
+        cat: round((count / total)*100, 2) if total > 0 else 0
+        for cat, count in counts.items()
+    }
+
+@instrumented("classify_text_hf")
+def classify_text_hf(text, threshold=0.8, batch_size=DETECTOR_BATCH_SIZE, batcher=None, cache=None):
     """
     Splits text into sentences, uses roberta-base-openai-detector to classify each sentence
     as AI-generated or human-written, returning a map of {sentence: label} and overall percentages.
+    Sentences already in the detector cache (or the given ResultCache) are not re-run;
+    the rest are classified in length-bucketed batches of batch_size, or through
+    batcher (a DetectorBatcher) to share forward passes with concurrent callers.
     """
-    detector = load_detector_model()
+    ensure_nltk_data()
     sentences = sent_tokenize(text)
-    results = detector(sentences, truncation=True)
+    results = detect_sentences(sentences, batch_size, batcher=batcher, cache=cache)
 
     classification_map = {}
-    counts = {
-        "AI-generated": 0,
-        "AI-generated & AI-refined": 0,
-        "Human-written": 0,
-        "Human-written & AI-refined": 0
-    }
+    counts = dict.fromkeys(LABELS, 0)
 
     for sentence, result in zip(sentences, results):
-        label = result['label'].upper()  # "FAKE" or "REAL"
-        score = result['score']
-        if label == "FAKE":
-            if score >= threshold:
-                new_label = "AI-generated"
-            else:
-                new_label = "AI-generated & AI-refined"
-        elif label == "REAL":
-            if score >= threshold:
-                new_label = "Human-written"
-            else:
-                new_label = "Human-written & AI-refined"
-        else:
-            new_label = "Human-written"
+        new_label = label_for(result, threshold)
         classification_map[sentence] = new_label
         counts[new_label] += 1
 
-    total = sum(counts.values())
-    percentages = {
-        cat: round((count / total)*100, 2) if total > 0 else 0
-        for cat, count in counts.items()
-    }
-    return classification_map, percentages
+    return classification_map, label_percentages(counts)
@@ -1,10 +1,9 @@
 # utils/citation_utils.py
 import re
-import nltk
 from nltk.tokenize import sent_tokenize
 from utils.model_loaders import load_paraphrase_model
-
-nltk.download('punkt', quiet=True)
+from utils.paraphrase_engine import PARAPHRASE_BATCH_SIZE, generate_batched
+from utils.resources import ensure_nltk_data
 
 # A refined regex to match typical APA-like references (e.g., (Karaman & Frazzoli, 2011, pp. 83–86))
 CITATION_PATTERN = re.compile(
@@ -29,6 +28,21 @@ def restore_citations(paraphrased, mapping):
         result = result.replace(placeholder, ref)
     return result
 
+CITATION_PROMPT = (
+    "Rewrite the following sentence to be more natural while preserving all details and references exactly. "
+    "Do NOT remove, alter, or reposition placeholders like [[REF_x]].\n\n"
+    "Original: {sentence}"
+)
+
+# Sampling settings shared by the single-sentence and batched paths
+GENERATION_KWARGS = dict(
+    do_sample=True,
+    temperature=0.9,
+    top_p=0.95,
+    max_length=256,
+    max_new_tokens=256
+)
+
 def rewrite_sentence_preserving_citations(sentence):
     """
     Rewrite a single sentence using a T5-based paraphraser while preserving APA citations.
@@ -37,31 +51,45 @@ def rewrite_sentence_preserving_citations(sentence):
     if not replaced.strip():
         return sentence
 
-    prompt = (
-        "Rewrite the following sentence to be more natural while preserving all details and references exactly. "
-        "Do NOT remove, alter, or reposition placeholders like [[REF_x]].\n\n"
-        f"Original: {replaced}"
-    )
+    prompt = CITATION_PROMPT.format(sentence=replaced)
 
     paraphraser = load_paraphrase_model()
     output = paraphraser(
         prompt,
-        do_sample=True,
-        temperature=0.9,
-        top_p=0.95,
-        max_length=256,
         min_length=len(replaced.split()),
-        max_new_tokens=256
+        **GENERATION_KWARGS
     )
     paraphrased = output[0]["generated_text"].strip()
     final_sentence = restore_citations(paraphrased, mapping)
     return final_sentence
 
-def rewrite_text_preserving_citations(original_text):
-    """Rewrite input text sentence-by-sentence, preserving APA citations."""
+def rewrite_text_preserving_citations(original_text, batch_size=PARAPHRASE_BATCH_SIZE):
+    """
+    Rewrite input text sentence-by-sentence, preserving APA citations.
+    All prompts are built up front and generated in length-grouped batches;
+    each sentence keeps its own placeholder mapping.
+    """
+    ensure_nltk_data()
     sentences = sent_tokenize(original_text)
-    output_sentences = []
-    for s in sentences:
-        new_s = rewrite_sentence_preserving_citations(s)
-        output_sentences.append(new_s)
+
+    pending = []
+    for idx, s in enumerate(sentences):
+        replaced, mapping = extract_citations(s)
+        if replaced.strip():
+            pending.append((idx, replaced, mapping))
+    if not pending:
+        return " ".join(sentences)
+
+    paraphraser = load_paraphrase_model()
+    outputs = generate_batched(
+        paraphraser,
+        [CITATION_PROMPT.format(sentence=replaced) for _, replaced, _ in pending],
+        [len(replaced.split()) for _, replaced, _ in pending],
+        batch_size=batch_size,
+        **GENERATION_KWARGS
+    )
+
+    output_sentences = list(sentences)
+    for (idx, _, mapping), paraphrased in zip(pending, outputs):
+        output_sentences[idx] = restore_citations(paraphrased, mapping)
     return " ".join(output_sentences)
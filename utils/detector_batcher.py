@@ -0,0 +1,96 @@
+# utils/detector_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from utils.ai_detection_utils import run_detector
+from utils.model_loaders import load_detector_model
+
+BATCHER_MAX_WAIT_MS = 10
+BATCHER_MAX_ITEMS = 64
+
+class DetectorBatcher:
+    """
+    Coalesces detector calls from concurrent callers. Sentences queued within
+    max_wait_ms of each other (up to max_items) share one batched forward pass,
+    and each caller gets back exactly its own results, in order.
+    """
+
+    def __init__(self, max_wait_ms=BATCHER_MAX_WAIT_MS, max_items=BATCHER_MAX_ITEMS, loader=load_detector_model):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_items = max_items
+        self.loader = loader
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="detector-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, sentences):
+        """Queue sentences for classification; returns a Future of their results."""
+        future = Future()
+        if not sentences:
+            future.set_result([])
+            return future
+        self._ensure_thread()
+        self._queue.put((list(sentences), future))
+        return future
+
+    def classify(self, sentences):
+        """Blocking helper: classify sentences through the shared batch."""
+        return self.submit(sentences).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        count = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            sentences = [s for item_sentences, _ in batch for s in item_sentences]
+            try:
+                results = run_detector(self.loader(), sentences, batch_size=self.max_items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            start = 0
+            for item_sentences, future in batch:
+                future.set_result(results[start:start + len(item_sentences)])
+                start += len(item_sentences)
+
+    def stats(self):
+        """Forward passes run vs. caller requests served (requests / batches = coalescing factor)."""
+        return {"batches": self.batches, "requests": self.requests, "queued": self._queue.qsize()}
+
+_shared_batcher = None
+_shared_lock = threading.Lock()
+
+def get_detector_batcher():
+    """Process-wide batcher shared by every caller of the detector."""
+    global _shared_batcher
+    with _shared_lock:
+        if _shared_batcher is None:
+            _shared_batcher = DetectorBatcher()
+        return _shared_batcher
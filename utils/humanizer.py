@@ -1,27 +1,21 @@
 import streamlit as st
-import nltk
 import re
 from nltk.tokenize import sent_tokenize, word_tokenize
-from transformers import pipeline
-
-
-# Make sure NLTK resources are downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+from utils.model_loaders import load_paraphrase_model
+from utils.paraphrase_engine import PARAPHRASE_BATCH_SIZE, generate_cached, get_paraphrase_cache
+from utils.resources import ensure_nltk_data
 
 # CITATION_REGEX: attempts to match something like (Smith et al., 2023, pp. 10-12)
 CITATION_REGEX = re.compile(
     r"\(\s*[A-Za-z&\-,\.\s]+(?:et al\.\s*)?,\s*\d{4}(?:,\s*(?:pp?\.\s*\d+(?:-\d+)?))?\s*\)"
 )
 
-@st.cache_resource
 def load_t5_model():
     """
-    Load T5-based text2text-generation model (e.g. google/flan-t5-base) once, for speed.
+    T5-based text2text-generation model (e.g. google/flan-t5-base), shared through the
+    model registry with utils.model_loaders.load_paraphrase_model.
     """
-    return pipeline("text2text-generation", model="google/flan-t5-base")
+    return load_paraphrase_model()
 
 def extract_citations(text):
     """
@@ -46,29 +40,31 @@ def restore_citations(text, placeholder_map):
         restored = restored.replace(placeholder, ref_text)
     return restored
 
-def sentence_level_rewrite(text, t5_pipeline, min_len=0, max_len=512):
+REWRITE_PROMPT = (
+    "Rewrite this sentence to sound more natural and human while preserving details.\n\n"
+    "Original: {sentence}"
+)
+
+def sentence_level_rewrite(text, t5_pipeline, min_len=0, max_len=512, batch_size=PARAPHRASE_BATCH_SIZE):
     """
-    Splits text by sentences, rewrites each with T5, then rejoins.
+    Splits text by sentences, rewrites them with T5 in length-grouped batches, then rejoins.
+    Decoding is deterministic, so sentences seen before come from the paraphrase cache.
     """
-    sentences = sent_tokenize(text)
-    out_sents = []
-    for sent in sentences:
-        if not sent.strip():
-            continue
-        prompt = (
-            "Rewrite this sentence to sound more natural and human while preserving details.\n\n"
-            f"Original: {sent}"
-        )
-        res = t5_pipeline(
-            prompt,
-            do_sample=False,       # beam search, deterministic
-            num_beams=4,
-            min_length=max(min_len, len(word_tokenize(sent))),
-            max_length=max_len,
-            max_new_tokens=max_len
-        )
-        new_sent = res[0]["generated_text"].strip()
-        out_sents.append(new_sent)
+    ensure_nltk_data()
+    sentences = [sent for sent in sent_tokenize(text) if sent.strip()]
+    if not sentences:
+        return ""
+    out_sents = generate_cached(
+        t5_pipeline,
+        REWRITE_PROMPT,
+        sentences,
+        [max(min_len, len(word_tokenize(sent))) for sent in sentences],
+        batch_size=batch_size,
+        do_sample=False,       # beam search, deterministic
+        num_beams=4,
+        max_length=max_len,
+        max_new_tokens=max_len
+    )
     return " ".join(out_sents)
 
 def minimal_humanize_text(text):
@@ -90,9 +86,11 @@ def minimal_humanize_text(text):
     return final
 
 def count_words(text):
+    ensure_nltk_data()
     return len(word_tokenize(text))
 
 def count_sentences(text):
+    ensure_nltk_data()
     return len(sent_tokenize(text))
 
 ###############################################
@@ -128,5 +126,11 @@ def main():
             st.markdown(f"**Rewritten Word Count:** {new_wordcount}")
             st.markdown(f"**Rewritten Sentence Count:** {new_sentcount}")
 
+        cache_stats = get_paraphrase_cache().stats()
+        st.caption(
+            f"Paraphrase cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+            f"{cache_stats['size']}/{cache_stats['maxsize']} sentences"
+        )
+
 if __name__ == '__main__':
     main()
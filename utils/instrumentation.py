@@ -0,0 +1,380 @@
+# utils/instrumentation.py
+"""
+Per-stage timing for the humanizer, scorer, detector and PDF helpers.
+
+Each instrumented stage records wall time, CPU time (of the calling thread), input
+size and, when memory tracing is on, the peak traced allocation while it ran.
+Records go to every registered sink:
+
+    HUMANIZER_METRICS_SINKS=log,histogram,prometheus
+    HUMANIZER_METRICS_PROM_PATH=/var/lib/node_exporter/humanizer.prom
+    HUMANIZER_TRACE_MEMORY=1
+
+capture() additionally collects the records produced inside a block on the current
+thread, which is what the Streamlit debug panel shows.
+
+tracemalloc is process-wide, so peaks are only reported for a stage tree that ran
+alone: while two instrumented calls overlap (Streamlit sessions, API threads) their
+peak_bytes come back as None rather than mixing each other's allocations.
+"""
+import atexit
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger("humanizer.metrics")
+
+# Upper bounds (seconds) of the histogram buckets
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROMETHEUS_WRITE_INTERVAL = 1.0
+
+TRACE_MEMORY = os.environ.get("HUMANIZER_TRACE_MEMORY", "").lower() in ("1", "true", "yes")
+
+_local = threading.local()
+
+def _state():
+    """This thread's open stage frames and active capture() collectors."""
+    if not hasattr(_local, "frames"):
+        _local.frames = []
+        _local.captures = []  # (records, trace memory?) per capture() block
+    return _local
+
+########################################
+# Sinks
+########################################
+class LoggingSink:
+    """One log line per stage on the humanizer.metrics logger."""
+
+    def __init__(self, level=logging.INFO):
+        self.level = level
+
+    def record(self, record):
+        peak = record["peak_bytes"]
+        logger.log(
+            self.level, "%s wall=%.4fs cpu=%.4fs size=%s%s", record["stage"], record["wall_seconds"],
+            record["cpu_seconds"], record["size"], f" peak={peak}B" if peak is not None else ""
+        )
+
+class HistogramSink:
+    """In-process latency histograms per stage, plus CPU totals and the largest peak seen."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        with self._lock:
+            entry = self.stages.setdefault(record["stage"], {
+                "counts": [0] * len(self.buckets),
+                "count": 0,
+                "wall_sum": 0.0,
+                "cpu_sum": 0.0,
+                "size_sum": 0,
+                "max_peak_bytes": None,
+            })
+            for i, bound in enumerate(self.buckets):
+                if record["wall_seconds"] <= bound:
+                    entry["counts"][i] += 1
+            entry["count"] += 1
+            entry["wall_sum"] += record["wall_seconds"]
+            entry["cpu_sum"] += record["cpu_seconds"]
+            entry["size_sum"] += record["size"] or 0
+            if record["peak_bytes"] is not None:
+                entry["max_peak_bytes"] = max(entry["max_peak_bytes"] or 0, record["peak_bytes"])
+
+    def quantile(self, stage, q):
+        """Bucket upper bound below which a fraction q of the stage's calls finished."""
+        with self._lock:
+            entry = self.stages.get(stage)
+            if not entry or not entry["count"]:
+                return None
+            target = q * entry["count"]
+            for bound, cumulative in zip(self.buckets, entry["counts"]):
+                if cumulative >= target:
+                    return bound
+            return float("inf")
+
+    def summary(self):
+        """{stage: {count, mean wall/cpu seconds, p50, p95, max peak}} for display."""
+        with self._lock:
+            stages = {name: dict(entry) for name, entry in self.stages.items()}
+        return {
+            name: {
+                "count": entry["count"],
+                "mean_wall_seconds": entry["wall_sum"] / entry["count"],
+                "mean_cpu_seconds": entry["cpu_sum"] / entry["count"],
+                "p50_seconds": self.quantile(name, 0.5),
+                "p95_seconds": self.quantile(name, 0.95),
+                "max_peak_bytes": entry["max_peak_bytes"],
+            }
+            for name, entry in stages.items()
+        }
+
+_prometheus_files = set()
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class PrometheusFileSink(HistogramSink):
+    """
+    Histogram sink that also rewrites a Prometheus text-exposition file (for the
+    node_exporter textfile collector) at most every write_interval seconds.
+
+    Each process writes its own file, path with the PID before the extension
+    (humanizer.prom -> humanizer.1234.prom), and labels its series with pid, so
+    Streamlit, API and worker processes never overwrite one another.
+    """
+
+    def __init__(self, path, buckets=STAGE_BUCKETS, write_interval=PROMETHEUS_WRITE_INTERVAL):
+        super().__init__(buckets)
+        self.path = path
+        self.write_interval = write_interval
+        self._last_write = 0.0
+        self._pid = os.getpid()
+
+    def process_path(self, pid=None):
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{os.getpid() if pid is None else pid}{ext or '.prom'}"
+
+    def record(self, record):
+        if os.getpid() != self._pid:
+            # Forked child: start from empty histograms and a file of its own
+            with self._lock:
+                self._pid = os.getpid()
+                self.stages = {}
+                self._last_write = 0.0
+        super().record(record)
+        now = time.monotonic()
+        if now - self._last_write >= self.write_interval:
+            self._last_write = now
+            self.write()
+
+    def render(self, pid=None):
+        pid = os.getpid() if pid is None else pid
+        lines = [
+            "# HELP humanizer_stage_seconds Wall time per pipeline stage.",
+            "# TYPE humanizer_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self.stages.items())
+            for stage, entry in stages:
+                for bound, cumulative in zip(self.buckets, entry["counts"]):
+                    lines.append(f'humanizer_stage_seconds_bucket{{pid="{pid}",stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'humanizer_stage_seconds_bucket{{pid="{pid}",stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'humanizer_stage_seconds_sum{{pid="{pid}",stage="{stage}"}} {entry["wall_sum"]}')
+                lines.append(f'humanizer_stage_seconds_count{{pid="{pid}",stage="{stage}"}} {entry["count"]}')
+            lines.append("# HELP humanizer_stage_cpu_seconds_total CPU time spent per pipeline stage.")
+            lines.append("# TYPE humanizer_stage_cpu_seconds_total counter")
+            for stage, entry in stages:
+                lines.append(f'humanizer_stage_cpu_seconds_total{{pid="{pid}",stage="{stage}"}} {entry["cpu_sum"]}')
+            lines.append("# HELP humanizer_stage_input_size_total Input size (characters or bytes) per stage.")
+            lines.append("# TYPE humanizer_stage_input_size_total counter")
+            for stage, entry in stages:
+                lines.append(f'humanizer_stage_input_size_total{{pid="{pid}",stage="{stage}"}} {entry["size_sum"]}')
+            lines.append("# HELP humanizer_stage_peak_bytes Largest traced allocation peak per stage.")
+            lines.append("# TYPE humanizer_stage_peak_bytes gauge")
+            for stage, entry in stages:
+                if entry["max_peak_bytes"] is not None:
+                    lines.append(f'humanizer_stage_peak_bytes{{pid="{pid}",stage="{stage}"}} {entry["max_peak_bytes"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        # Pid is read at write time: forked workers inherit the sink but not the file
+        pid = os.getpid()
+        path = self.process_path(pid)
+        # Write a private temp file then rename, so the collector never reads a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".humanizer-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render(pid))
+            os.replace(tmp_path, path)
+            if pid not in _prometheus_files:
+                _prometheus_files.add(pid)
+                atexit.register(_remove_quietly, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+def register_sink(sink):
+    """Send every future stage record to sink (anything with a record(record) method)."""
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+def get_sinks():
+    with _sinks_lock:
+        return list(_sinks)
+
+def stage_summary():
+    """HistogramSink.summary() of the first registered histogram sink, or None without one."""
+    for sink in get_sinks():
+        if isinstance(sink, HistogramSink):
+            return sink.summary()
+    return None
+
+def _configure_from_env():
+    for name in os.environ.get("HUMANIZER_METRICS_SINKS", "").split(","):
+        name = name.strip()
+        if name == "log":
+            register_sink(LoggingSink())
+        elif name == "histogram":
+            register_sink(HistogramSink())
+        elif name == "prometheus":
+            register_sink(PrometheusFileSink(os.environ.get("HUMANIZER_METRICS_PROM_PATH", "humanizer.prom")))
+
+_configure_from_env()
+
+########################################
+# Recording
+########################################
+def _emit(record):
+    for sink in get_sinks():
+        try:
+            sink.record(record)
+        except Exception:
+            logger.exception("Metrics sink %r failed", sink)
+    for records, _ in _state().captures:
+        records.append(record)
+
+# tracemalloc is one process-wide tracer, so only one stage tree at a time may drive
+# it. _trace_owner is the thread whose outermost stage holds it; _trace_shared marks
+# that another outermost stage overlapped it, which spoils the remaining peaks.
+_trace_lock = threading.Lock()
+_trace_owner = None
+_trace_shared = False
+_trace_started = False
+_active_roots = 0
+
+def _enter_root(trace):
+    """Count a new outermost stage; return True if this thread now owns tracemalloc."""
+    global _trace_owner, _trace_shared, _trace_started, _active_roots
+    with _trace_lock:
+        _active_roots += 1
+        if _trace_owner is not None:
+            _trace_shared = True
+            return False
+        if not trace or _active_roots > 1:
+            return False
+        _trace_owner = threading.get_ident()
+        _trace_shared = False
+        # Tracing slows every allocation, so whoever starts it also stops it
+        _trace_started = not tracemalloc.is_tracing()
+        if _trace_started:
+            tracemalloc.start()
+        return True
+
+def _exit_root(owner):
+    global _trace_owner, _active_roots
+    with _trace_lock:
+        _active_roots -= 1
+        if owner:
+            _trace_owner = None
+            if _trace_started and not TRACE_MEMORY:
+                tracemalloc.stop()
+
+def _tracing_alone():
+    return _trace_owner == threading.get_ident() and not _trace_shared
+
+@contextmanager
+def stage(name, size=None):
+    """
+    Time the enclosed block as one stage. Nested stages are recorded separately
+    (a parent's numbers include its children).
+    """
+    state = _state()
+    frames = state.frames
+    if not get_sinks() and not state.captures:
+        yield
+        return
+
+    root = not frames
+    if root:
+        state.trace_owner = _enter_root(TRACE_MEMORY or any(memory for _, memory in state.captures))
+    frame = {"baseline": None, "peak": 0}
+    if _tracing_alone():
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            # The parent keeps the highest point reached before we reset the peak
+            frames[-1]["peak"] = max(frames[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["baseline"] = current
+        frame["peak"] = current
+    frames.append(frame)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        frames.pop()
+        peak_bytes = None
+        if frame["baseline"] is not None and _tracing_alone():
+            absolute_peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            peak_bytes = absolute_peak - frame["baseline"]
+            if frames:
+                frames[-1]["peak"] = max(frames[-1]["peak"], absolute_peak)
+        if root:
+            _exit_root(state.trace_owner)
+        _emit({
+            "stage": name,
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "size": size,
+            "peak_bytes": peak_bytes,
+            "depth": len(frames),
+        })
+
+def input_size(value):
+    """Size recorded for a stage input: length of text/bytes, else None."""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    getbuffer = getattr(value, "getbuffer", None)  # BytesIO uploads
+    if getbuffer is not None:
+        return getbuffer().nbytes
+    return None
+
+def instrumented(name):
+    """Decorator: record each call as stage `name`, sized by its first argument."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name, input_size(args[0]) if args else None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def capture(memory=False):
+    """
+    Collect the stage records emitted on this thread inside the block; memory=True
+    also traces peak allocations for them:
+
+        with capture() as records:
+            advanced_humanize(text)
+    """
+    captures = _state().captures
+    entry = ([], memory)
+    captures.append(entry)
+    try:
+        yield entry[0]
+    finally:
+        captures.remove(entry)
@@ -1,13 +1,156 @@
 # utils/model_loaders.py
-import streamlit as st
-from transformers import pipeline
+import os
+import sys
+from transformers import AutoModelForSeq2SeqLM, AutoModelForSequenceClassification, AutoTokenizer, pipeline
+from utils.model_registry import registry
 
-@st.cache_resource
-def load_detector_model():
+DETECTOR_MODEL = "roberta-base-openai-detector"
+PARAPHRASE_MODEL = "google/flan-t5-base"
+
+# "torch" (fp32), "int8" (torch dynamic quantization) or "onnx" (ONNX Runtime via optimum)
+BACKENDS = ("torch", "int8", "onnx")
+INFERENCE_BACKEND = os.environ.get("HUMANIZER_INFERENCE_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get("HUMANIZER_ONNX_DIR", "onnx_models")
+INFERENCE_DEVICE = os.environ.get("HUMANIZER_INFERENCE_DEVICE", "cpu")
+# Unload models left unused this long (seconds); unset keeps them for the process lifetime
+MODEL_IDLE_SECONDS = os.environ.get("HUMANIZER_MODEL_IDLE_SECONDS")
+
+PIPELINE_MODELS = (("text-classification", DETECTOR_MODEL), ("text2text-generation", PARAPHRASE_MODEL))
+
+TASK_MODEL_CLASSES = {
+    "text-classification": AutoModelForSequenceClassification,
+    "text2text-generation": AutoModelForSeq2SeqLM,
+}
+
+def onnx_model_path(model_name):
+    """Local directory holding the exported ONNX copy of model_name."""
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "--"))
+
+def _onnx_model_class(task):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    except ImportError:
+        raise ImportError("The onnx backend needs optimum: pip install 'optimum[onnxruntime]'")
+    return ORTModelForSequenceClassification if task == "text-classification" else ORTModelForSeq2SeqLM
+
+def export_onnx(task, model_name):
+    """Export model_name to its ONNX directory unless it is already there; returns the directory."""
+    local_dir = onnx_model_path(model_name)
+    if not os.path.isdir(local_dir):
+        model = _onnx_model_class(task).from_pretrained(model_name, export=True)
+        model.save_pretrained(local_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(local_dir)
+    return local_dir
+
+def _load_onnx(task, model_name, device):
+    # Exporting takes minutes, so it happens in warm_up or the CLI, never mid-request
+    local_dir = onnx_model_path(model_name)
+    if not os.path.isdir(local_dir):
+        raise FileNotFoundError(
+            f"No ONNX export of {model_name} in {local_dir}; run: python -m utils.model_loaders export-onnx"
+        )
+    provider = "CUDAExecutionProvider" if str(device).startswith("cuda") else "CPUExecutionProvider"
+    model = _onnx_model_class(task).from_pretrained(local_dir, provider=provider)
+    return model, AutoTokenizer.from_pretrained(local_dir)
+
+def resolve_device(backend, device):
+    """Device a backend really runs on: dynamic int8 quantization is CPU-only."""
+    return "cpu" if backend == "int8" else device
+
+def pipeline_backend(pipe):
+    """Backend a pipeline was actually built with, as recorded by build_pipeline."""
+    return getattr(pipe, "humanizer_backend", "torch")
+
+def build_pipeline(task, model_name, backend=INFERENCE_BACKEND, device=INFERENCE_DEVICE):
+    """Build a transformers pipeline for task on the selected inference backend."""
+    device = resolve_device(backend, device)
+    if backend == "torch":
+        pipe = pipeline(task, model=model_name, device=device)
+    elif backend == "int8":
+        import torch
+        model = TASK_MODEL_CLASSES[task].from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        pipe = pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_name), device=device)
+    elif backend == "onnx":
+        # The execution provider picked from device places the model
+        model, tokenizer = _load_onnx(task, model_name, device)
+        pipe = pipeline(task, model=model, tokenizer=tokenizer)
+    else:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    # Cache keys use this rather than the configured backend
+    pipe.humanizer_backend = backend
+    return pipe
+
+def get_pipeline(task, model_name, backend=INFERENCE_BACKEND, device=INFERENCE_DEVICE):
+    """Shared pipeline from the model registry; built on first request only."""
+    if MODEL_IDLE_SECONDS:
+        registry.start_idle_eviction(float(MODEL_IDLE_SECONDS))
+    device = resolve_device(backend, device)
+    return registry.get(
+        task, model_name, backend, device,
+        loader=lambda: build_pipeline(task, model_name, backend, device)
+    )
+
+def load_detector_model(backend=INFERENCE_BACKEND, device=INFERENCE_DEVICE):
     """Load the roberta-base-openai-detector pipeline for AI text detection."""
-    return pipeline("text-classification", model="roberta-base-openai-detector")
+    return get_pipeline("text-classification", DETECTOR_MODEL, backend, device)
 
-@st.cache_resource
-def load_paraphrase_model():
+def load_paraphrase_model(backend=INFERENCE_BACKEND, device=INFERENCE_DEVICE):
     """Load the T5-based paraphrasing pipeline (e.g., google/flan-t5-base)."""
-    return pipeline("text2text-generation", model="google/flan-t5-base")
+    return get_pipeline("text2text-generation", PARAPHRASE_MODEL, backend, device)
+
+########################################
+# Backend parity check
+########################################
+# Optional: runs from the CLI below, or from warm_up() when HUMANIZER_CHECK_PARITY=1.
+# It loads fp32 torch next to the candidate backend, so it never runs by default.
+CHECK_PARITY = os.environ.get("HUMANIZER_CHECK_PARITY", "").lower() in ("1", "true", "yes")
+
+PARITY_SAMPLES = [
+    "The results demonstrate a significant improvement in overall system performance.",
+    "honestly i wasn't sure the bus would show up, so we just walked.",
+    "In conclusion, it is important to note that these findings have broad implications.",
+    "My grandmother's kitchen always smelled like cardamom and burnt toast.",
+]
+def check_backend_parity(backend, samples=PARITY_SAMPLES, score_tolerance=0.05):
+    """
+    Compare a backend against fp32 torch on the same inputs. Detector labels must
+    agree and scores stay within score_tolerance; beam-search paraphrases are
+    reported as an exact-match rate. Returns a report dict with "ok".
+    """
+    reference = build_pipeline("text-classification", DETECTOR_MODEL, "torch")(samples, truncation=True)
+    candidate = build_pipeline("text-classification", DETECTOR_MODEL, backend)(samples, truncation=True)
+    label_agreement = sum(r["label"] == c["label"] for r, c in zip(reference, candidate)) / len(samples)
+    max_score_diff = max(abs(r["score"] - c["score"]) for r, c in zip(reference, candidate))
+
+    generation_kwargs = dict(do_sample=False, num_beams=4, max_new_tokens=64)
+    reference = build_pipeline("text2text-generation", PARAPHRASE_MODEL, "torch")(samples, **generation_kwargs)
+    candidate = build_pipeline("text2text-generation", PARAPHRASE_MODEL, backend)(samples, **generation_kwargs)
+    exact_match = sum(
+        r["generated_text"] == c["generated_text"] for r, c in zip(reference, candidate)
+    ) / len(samples)
+
+    return {
+        "backend": backend,
+        "detector_label_agreement": label_agreement,
+        "detector_max_score_diff": max_score_diff,
+        "paraphrase_exact_match": exact_match,
+        "ok": label_agreement == 1.0 and max_score_diff <= score_tolerance,
+    }
+
+if __name__ == "__main__":
+    # python -m utils.model_loaders export-onnx | parity <backend>
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "export-onnx":
+        for task, model_name in PIPELINE_MODELS:
+            print(f"Exported {model_name} to {export_onnx(task, model_name)}")
+    elif command == "parity" and len(sys.argv) > 2:
+        if sys.argv[2] == "onnx":
+            for task, model_name in PIPELINE_MODELS:
+                export_onnx(task, model_name)
+        report = check_backend_parity(sys.argv[2])
+        print(report)
+        sys.exit(0 if report["ok"] else 1)
+    else:
+        print("usage: python -m utils.model_loaders export-onnx | parity <int8|onnx>")
+        sys.exit(2)
@@ -0,0 +1,107 @@
+# utils/model_registry.py
+import threading
+import time
+
+class ModelRegistry:
+    """
+    Process-wide store of loaded models keyed by (task, model, backend, device).
+    Every caller asking for the same key shares one instance; instances can be
+    unloaded explicitly or evicted after sitting idle.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._load_locks = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+
+    def get(self, task, model, backend, device, loader):
+        """Return the shared instance for the key, calling loader() only on first use."""
+        key = (task, model, backend, device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["last_used"] = time.time()
+                return entry["instance"]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available meanwhile
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                started = time.perf_counter()
+                instance = loader()
+                entry = {
+                    "instance": instance,
+                    "load_seconds": time.perf_counter() - started,
+                    "loaded_at": time.time(),
+                }
+                with self._lock:
+                    self._entries[key] = entry
+            entry["last_used"] = time.time()
+            return entry["instance"]
+
+    def unload(self, task=None, model=None, backend=None, device=None):
+        """Drop every entry matching the given key fields (None matches anything)."""
+        wanted = (task, model, backend, device)
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if all(w is None or w == k for w, k in zip(wanted, key))
+            ]
+            for key in keys:
+                del self._entries[key]
+        return keys
+
+    def evict_idle(self, max_idle_seconds):
+        """Unload models not used in the last max_idle_seconds."""
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry["last_used"] < cutoff]
+            for key in keys:
+                del self._entries[key]
+        return keys
+
+    def start_idle_eviction(self, max_idle_seconds, interval_seconds=60):
+        """Run evict_idle in a background thread every interval_seconds."""
+        def reap():
+            while True:
+                time.sleep(interval_seconds)
+                self.evict_idle(max_idle_seconds)
+
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=reap, name="model-reaper", daemon=True)
+                self._reaper.start()
+
+    def memory_report(self):
+        """Per-model parameter and buffer memory in bytes (None when it can't be measured)."""
+        with self._lock:
+            entries = list(self._entries.items())
+        report = []
+        for (task, model, backend, device), entry in entries:
+            report.append({
+                "task": task,
+                "model": model,
+                "backend": backend,
+                "device": device,
+                "bytes": _model_bytes(entry["instance"]),
+                "load_seconds": round(entry["load_seconds"], 3),
+                "idle_seconds": round(time.time() - entry["last_used"], 1),
+            })
+        return report
+
+def _model_bytes(instance):
+    model = getattr(instance, "model", instance)
+    if not hasattr(model, "parameters"):
+        return None  # e.g. ONNX Runtime sessions
+    tensors = list(model.parameters()) + list(model.buffers())
+    # Dynamically quantized Linear layers keep their weights as packed params
+    for module in model.modules():
+        packed = getattr(module, "_packed_params", None)
+        if callable(getattr(type(packed), "_weight_bias", None)):
+            tensors.extend(t for t in packed._weight_bias() if t is not None)
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+registry = ModelRegistry()
@@ -0,0 +1,95 @@
+# utils/paraphrase_engine.py
+import os
+import threading
+from utils.model_loaders import PARAPHRASE_MODEL, pipeline_backend
+from utils.result_cache import ResultCache, make_key
+
+PARAPHRASE_BATCH_SIZE = 8
+PARAPHRASE_CACHE_SIZE = 4096
+# Set to a file path to spill generations to SQLite and keep them across restarts
+PARAPHRASE_CACHE_PATH = os.environ.get("HUMANIZER_PARAPHRASE_CACHE_PATH")
+# Bump when the meaning of a cached generation changes, so persisted entries are not reused
+PARAPHRASE_CACHE_VERSION = 2
+
+def generate_batched(paraphraser, prompts, min_lengths, batch_size=PARAPHRASE_BATCH_SIZE, **generate_kwargs):
+    """
+    Run a text2text-generation pipeline over all prompts at once.
+    Prompts are grouped by min_length and then by length into batches of at most
+    batch_size, so every prompt keeps its own min_length; outputs come back in
+    input order.
+    """
+    order = sorted(range(len(prompts)), key=lambda i: (min_lengths[i], len(prompts[i])))
+    batches = []
+    for i in order:
+        if batches and len(batches[-1]) < batch_size and min_lengths[batches[-1][0]] == min_lengths[i]:
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    outputs = [None] * len(prompts)
+    for batch in batches:
+        results = paraphraser(
+            [prompts[i] for i in batch],
+            min_length=min_lengths[batch[0]],
+            batch_size=len(batch),
+            **generate_kwargs
+        )
+        for i, result in zip(batch, results):
+            # Single-sequence results may or may not come wrapped in a list
+            if isinstance(result, list):
+                result = result[0]
+            outputs[i] = result["generated_text"].strip()
+    return outputs
+
+########################################
+# Generation cache
+########################################
+_paraphrase_cache = None
+_paraphrase_cache_lock = threading.Lock()
+
+def get_paraphrase_cache():
+    """Process-wide prompt -> generated text cache (LRU, optional SQLite tier)."""
+    global _paraphrase_cache
+    with _paraphrase_cache_lock:
+        if _paraphrase_cache is None:
+            _paraphrase_cache = ResultCache(maxsize=PARAPHRASE_CACHE_SIZE, path=PARAPHRASE_CACHE_PATH)
+        return _paraphrase_cache
+
+def pipeline_id(paraphraser):
+    """Model identity used in cache keys: checkpoint name plus the backend it was built with."""
+    model = getattr(paraphraser, "model", None)
+    return f"{getattr(model, 'name_or_path', PARAPHRASE_MODEL)}:{pipeline_backend(paraphraser)}"
+
+def generate_cached(paraphraser, template, sentences, min_lengths, batch_size=PARAPHRASE_BATCH_SIZE,
+                    cache=None, **generate_kwargs):
+    """
+    generate_batched over template.format(sentence=...) for each sentence, memoized per
+    (model, template, sentence, min_length, generation settings). generate_batched
+    never mixes min_lengths in a batch, so the keyed min_length is the one the output
+    was generated with. Only use it with deterministic decoding (do_sample=False);
+    cache hits never reach the model.
+    """
+    cache = get_paraphrase_cache() if cache is None else cache
+    model_id = pipeline_id(paraphraser)
+    settings = sorted(generate_kwargs.items())
+    keys = [
+        make_key("paraphrase", PARAPHRASE_CACHE_VERSION, model_id, template, sentence, min_length, settings)
+        for sentence, min_length in zip(sentences, min_lengths)
+    ]
+    outputs = cache.get_many(keys)
+
+    misses = {}
+    for key, sentence, min_length in zip(keys, sentences, min_lengths):
+        if key not in outputs:
+            misses.setdefault(key, (sentence, min_length))
+    if misses:
+        generated = generate_batched(
+            paraphraser,
+            [template.format(sentence=sentence) for sentence, _ in misses.values()],
+            [min_length for _, min_length in misses.values()],
+            batch_size=batch_size,
+            **generate_kwargs
+        )
+        fresh = dict(zip(misses, generated))
+        cache.set_many(fresh.items())
+        outputs.update(fresh)
+    return [outputs[key] for key in keys]
@@ -1,63 +1,378 @@
 # utils/pdf_utils.py
 import fitz
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-import nltk
 from nltk.tokenize import sent_tokenize, word_tokenize
+from utils.ai_detection_utils import DETECTOR_BATCH_SIZE, LABELS, detect_sentences, label_for, label_percentages
+from utils.instrumentation import instrumented, stage
+from utils.resources import ensure_nltk_data
 
-nltk.download('punkt', quiet=True)
+def iter_page_texts(doc):
+    """Yield each page's text, one page at a time."""
+    for page in doc:
+        yield page.get_text("text")
 
+@instrumented("pdf.extract_text_from_pdf")
 def extract_text_from_pdf(pdf_bytes):
     """Extract text from all pages of a PDF."""
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    all_text = ""
-    for page in doc:
-        all_text += page.get_text("text") + "\n"
+    all_text = "".join(text + "\n" for text in iter_page_texts(doc))
     doc.close()
     return all_text
 
 def word_count(text):
+    ensure_nltk_data()
     return len(word_tokenize(text))
 
+LEGEND_TEXT = (
+    "Color Legend:\n"
+    "• Red: AI-generated\n"
+    "• Orange: AI-generated & AI-refined\n"
+    "• Light Blue: Human-written & AI-refined\n\n"
+    "Note: Sentences classified as 'Human-written' are not highlighted."
+)
+
+COLOR_MAPPING = {
+    "AI-generated": "#ffcccc",
+    "AI-generated & AI-refined": "#ffe5cc",
+    "Human-written & AI-refined": "#e6f2ff"
+}
+
+# Sentences are looked up by their first few words, so each lookup only
+# touches the handful of places those words actually occur.
+INDEX_NGRAM = 3
+
+def hex_to_rgb_float(hex_color):
+    hex_color = hex_color.lstrip('#')
+    r = int(hex_color[0:2], 16) / 255.0
+    g = int(hex_color[2:4], 16) / 255.0
+    b = int(hex_color[4:6], 16) / 255.0
+    return (r, g, b)
+
+def extract_words(doc, pages=None):
+    """
+    Extract every word once, in reading order, as parallel lists:
+    casefolded word texts and their (page number, line key, rect) positions.
+    """
+    words, positions = [], []
+    for pno in (range(len(doc)) if pages is None else pages):
+        for x0, y0, x1, y1, word, block, line, _ in doc[pno].get_text("words"):
+            words.append(word.casefold())
+            positions.append((pno, (block, line), fitz.Rect(x0, y0, x1, y1)))
+    return words, positions
+
+def locate_sentences(words, sentences):
+    """Map each sentence to every (start, end) word span where it occurs."""
+    indexes = {}
+
+    def index_for(n):
+        if n not in indexes:
+            index = {}
+            for i in range(len(words) - n + 1):
+                index.setdefault(tuple(words[i:i + n]), []).append(i)
+            indexes[n] = index
+        return indexes[n]
+
+    spans = {}
+    for sentence in sentences:
+        target = [w.casefold() for w in sentence.split()]
+        if not target:
+            continue
+        n = min(INDEX_NGRAM, len(target))
+        spans[sentence] = [
+            (i, i + len(target))
+            for i in index_for(n).get(tuple(target[:n]), ())
+            if words[i:i + len(target)] == target
+        ]
+    return spans
+
+def span_rects(positions, start, end):
+    """Merge the word rects of a span into one rect per (page, line)."""
+    lines = {}
+    for pno, line, rect in positions[start:end]:
+        key = (pno, line)
+        lines[key] = lines[key] | rect if key in lines else fitz.Rect(rect)
+    by_page = {}
+    for (pno, _), rect in lines.items():
+        by_page.setdefault(pno, []).append(rect)
+    return by_page
+
+def highlight(page, rects, color):
+    annot = page.add_highlight_annot(rects)
+    annot.set_colors(stroke=color)
+    annot.update()
+
+@instrumented("pdf.generate_annotated_pdf")
 def generate_annotated_pdf(pdf_bytes, classification_map):
     """Generate an annotated PDF with color-coded highlights for AI text."""
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    legend_text = (
-        "Color Legend:\n"
-        "• Red: AI-generated\n"
-        "• Orange: AI-generated & AI-refined\n"
-        "• Light Blue: Human-written & AI-refined\n\n"
-        "Note: Sentences classified as 'Human-written' are not highlighted."
-    )
+
+    # One extraction pass, one sentence -> span index, then draw straight from it
+    highlighted = {
+        sentence: label for sentence, label in classification_map.items()
+        if COLOR_MAPPING.get(label)
+    }
+    words, positions = extract_words(doc)
+    spans = locate_sentences(words, highlighted)
+
+    for sentence, label in highlighted.items():
+        color = hex_to_rgb_float(COLOR_MAPPING[label])
+        for start, end in spans.get(sentence, ()):
+            for pno, rects in span_rects(positions, start, end).items():
+                highlight(doc[pno], rects, color)
+
     legend_page = doc.new_page(pno=0)
-    legend_page.insert_text((72, 72), legend_text, fontsize=14, fontname="helv")
-
-    def hex_to_rgb_float(hex_color):
-        hex_color = hex_color.lstrip('#')
-        r = int(hex_color[0:2], 16) / 255.0
-        g = int(hex_color[2:4], 16) / 255.0
-        b = int(hex_color[4:6], 16) / 255.0
-        return (r, g, b)
-
-    COLOR_MAPPING = {
-        "AI-generated": "#ffcccc",
-        "AI-generated & AI-refined": "#ffe5cc",
-        "Human-written & AI-refined": "#e6f2ff"
+    legend_page.insert_text((72, 72), LEGEND_TEXT, fontsize=14, fontname="helv")
+
+    out_bytes = doc.write()
+    doc.close()
+    return BytesIO(out_bytes)
+
+########################################
+# Streaming extraction -> classification -> annotation
+########################################
+def iter_pdf_sentences(doc):
+    """
+    Yield (page number, sentence, word positions) as pages are read.
+    The trailing, possibly unfinished sentence of each page is carried into the
+    next one, so sentences that cross a page break come out whole.
+    """
+    ensure_nltk_data()
+    carry_words, carry_positions = [], []
+    page_count = len(doc)
+    for pno in range(page_count):
+        # Reading and splitting are timed per page; the stage closes before yielding
+        with stage("pdf.stream.read_page"):
+            for x0, y0, x1, y1, word, block, line, _ in doc[pno].get_text("words"):
+                carry_words.append(word)
+                carry_positions.append((pno, (block, line), fitz.Rect(x0, y0, x1, y1)))
+            if not carry_words:
+                continue
+
+            text = " ".join(carry_words)
+            offsets = []
+            offset = 0
+            for word in carry_words:
+                offsets.append(offset)
+                offset += len(word) + 1
+
+            sentences = sent_tokenize(text)
+            last_page = pno == page_count - 1
+            complete = sentences if last_page else sentences[:-1]
+
+            ready = []
+            cursor = 0
+            consumed = 0
+            for sentence in complete:
+                start = text.find(sentence, cursor)
+                if start < 0:
+                    continue
+                cursor = start + len(sentence)
+                end = bisect_left(offsets, cursor)
+                ready.append((pno, sentence, carry_positions[bisect_left(offsets, start):end]))
+                consumed = end
+
+            carry_words = carry_words[consumed:]
+            carry_positions = carry_positions[consumed:]
+        yield from ready
+
+def stream_classify_pdf(pdf_bytes, threshold=0.8, batch_size=DETECTOR_BATCH_SIZE, batcher=None):
+    """
+    Read, classify and annotate a PDF in one pass over one open document.
+
+    Yields a progress event after every page:
+        {"page": n, "pages": total, "classified": [(sentence, label), ...]}
+    listing the sentences classified since the previous event, then a final
+        {"done": True, "annotated_pdf": BytesIO, "percentages": {...}, "sentences": count}
+    Only the current batch and the cross-page carry are held in memory.
+    """
+    with stage("pdf.stream.open", len(pdf_bytes)):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    counts = dict.fromkeys(LABELS, 0)
+    batch = []
+    classified = []
+
+    def flush():
+        with stage("pdf.stream.classify_batch", len(batch)):
+            results = detect_sentences([sentence for sentence, _ in batch], batch_size, batcher=batcher)
+            for (sentence, positions), result in zip(batch, results):
+                label = label_for(result, threshold)
+                counts[label] += 1
+                classified.append((sentence, label))
+                color_hex = COLOR_MAPPING.get(label)
+                if color_hex:
+                    color = hex_to_rgb_float(color_hex)
+                    for pno, rects in span_rects(positions, 0, len(positions)).items():
+                        highlight(doc[pno], rects, color)
+        batch.clear()
+
+    page_count = len(doc)
+    current_page = 0
+    for pno, sentence, positions in iter_pdf_sentences(doc):
+        while current_page < pno:
+            yield {"page": current_page + 1, "pages": page_count, "classified": classified}
+            classified = []
+            current_page += 1
+        batch.append((sentence, positions))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    while current_page < page_count:
+        yield {"page": current_page + 1, "pages": page_count, "classified": classified}
+        classified = []
+        current_page += 1
+
+    with stage("pdf.stream.write"):
+        legend_page = doc.new_page(pno=0)
+        legend_page.insert_text((72, 72), LEGEND_TEXT, fontsize=14, fontname="helv")
+        out_bytes = doc.write()
+        doc.close()
+    yield {
+        "done": True,
+        "annotated_pdf": BytesIO(out_bytes),
+        "percentages": label_percentages(counts),
+        "sentences": sum(counts.values()),
     }
 
-    for sentence, label in classification_map.items():
-        if label == "Human-written":
-            continue
-        color_hex = COLOR_MAPPING.get(label)
-        if not color_hex:
-            continue
-        color = hex_to_rgb_float(color_hex)
-        for page in doc:
-            rects = page.search_for(sentence)
-            for rect in rects:
-                annot = page.add_highlight_annot(rect)
-                annot.set_colors(stroke=color)
-                annot.update()
+########################################
+# Parallel page-range processing
+########################################
+# Worker processes for large PDFs; set HUMANIZER_PDF_WORKERS=1 to keep everything in-process
+PDF_WORKERS = int(os.environ.get("HUMANIZER_PDF_WORKERS", os.cpu_count() or 1))
+# Below this many pages, process start-up costs more than it saves
+PARALLEL_MIN_PAGES = 40
+
+def pdf_page_count(pdf_bytes):
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    count = len(doc)
+    doc.close()
+    return count
+
+def page_ranges(page_count, parts):
+    """Split [0, page_count) into at most parts contiguous (start, end) ranges."""
+    size = max(1, math.ceil(page_count / max(parts, 1)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def _extract_range(path, start, end):
+    doc = fitz.open(path)
+    texts = list(iter_page_texts(doc[pno] for pno in range(start, end)))
+    doc.close()
+    return texts
+
+def _annotate_range(path, start, end, highlighted):
+    """
+    Worker: draw the highlights that fall on pages [start, end) and return just those
+    pages as PDF bytes. The neighbouring pages are read too, so sentences that cross
+    into or out of the range are still found; only their rects on our pages are drawn.
+    """
+    doc = fitz.open(path)
+    words, positions = extract_words(doc, range(max(start - 1, 0), min(end + 1, len(doc))))
+    spans = locate_sentences(words, highlighted)
+    for sentence, label in highlighted.items():
+        color = hex_to_rgb_float(COLOR_MAPPING[label])
+        for span_start, span_end in spans.get(sentence, ()):
+            for pno, rects in span_rects(positions, span_start, span_end).items():
+                if start <= pno < end:
+                    highlight(doc[pno], rects, color)
+    part = fitz.open()
+    part.insert_pdf(doc, from_page=start, to_page=end - 1)
+    doc.close()
+    out_bytes = part.write()
+    part.close()
+    return out_bytes
+
+def copy_document_structure(source, target):
+    """
+    Give target (the same pages as source, rebuilt) the source's metadata, outline and
+    links. Done before the legend page is inserted, which then shifts them all by one.
+    """
+    target.set_metadata(source.metadata)
+    target.set_toc(source.get_toc(simple=False))
+    for pno in range(len(source)):
+        for link in source[pno].get_links():
+            if link["kind"] in (fitz.LINK_GOTO, fitz.LINK_URI, fitz.LINK_LAUNCH, fitz.LINK_GOTOR):
+                target[pno].insert_link(link)
+
+class _SharedPdf:
+    """Writes the upload to a temp file once so worker processes can open it by path."""
+
+    def __init__(self, pdf_bytes):
+        self.pdf_bytes = pdf_bytes
+        self.path = None
+
+    def __enter__(self):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(self.pdf_bytes)
+            self.path = f.name
+        return self.path
+
+    def __exit__(self, *exc):
+        os.remove(self.path)
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
 
+def get_pdf_pool():
+    """One worker pool per process, reused across uploads instead of spawned per call."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Spawned, not forked: the app process runs threads (Streamlit, torch) that fork can't copy safely
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+@instrumented("pdf.parallel_extract_text")
+def parallel_extract_text(pdf_bytes, workers=PDF_WORKERS):
+    """extract_text_from_pdf, with page ranges extracted in worker processes."""
+    page_count = pdf_page_count(pdf_bytes)
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        return extract_text_from_pdf(pdf_bytes)
+    pool = get_pdf_pool()
+    with _SharedPdf(pdf_bytes) as path:
+        futures = [pool.submit(_extract_range, path, start, end) for start, end in page_ranges(page_count, workers)]
+        return "".join(text + "\n" for future in futures for text in future.result())
+
+@instrumented("pdf.parallel_annotate_pdf")
+def parallel_annotate_pdf(pdf_bytes, classification_map, workers=PDF_WORKERS):
+    """
+    generate_annotated_pdf, with each worker process highlighting its own page range.
+    The annotated ranges are stitched back together in page order, and the source's
+    metadata, outline and links are carried over.
+    """
+    page_count = pdf_page_count(pdf_bytes)
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        return generate_annotated_pdf(pdf_bytes, classification_map)
+
+    highlighted = {
+        sentence: label for sentence, label in classification_map.items()
+        if COLOR_MAPPING.get(label)
+    }
+    pool = get_pdf_pool()
+    with _SharedPdf(pdf_bytes) as path:
+        futures = [
+            pool.submit(_annotate_range, path, start, end, highlighted)
+            for start, end in page_ranges(page_count, workers)
+        ]
+        parts = [future.result() for future in futures]
+
+    source = fitz.open(stream=pdf_bytes, filetype="pdf")
+    doc = fitz.open()
+    for part_bytes in parts:
+        part = fitz.open(stream=part_bytes, filetype="pdf")
+        # A range only keeps links into itself, so links are copied from the source below
+        doc.insert_pdf(part, links=False)
+        part.close()
+    copy_document_structure(source, doc)
+    source.close()
+    legend_page = doc.new_page(pno=0)
+    legend_page.insert_text((72, 72), LEGEND_TEXT, fontsize=14, fontname="helv")
     out_bytes = doc.write()
     doc.close()
     return BytesIO(out_bytes)
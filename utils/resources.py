@@ -0,0 +1,90 @@
+# utils/resources.py
+import sys
+import threading
+import nltk
+import spacy
+import streamlit as st
+
+# NLTK package name -> path checked with nltk.data.find before any download
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'wordnet': 'corpora/wordnet',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+    'averaged_perceptron_tagger_eng': 'taggers/averaged_perceptron_tagger_eng',
+}
+
+# What sent_tokenize / word_tokenize actually need
+NLTK_TOKENIZER_RESOURCES = ('punkt', 'punkt_tab')
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Synonym replacement only reads pos_, is_stop, is_punct and whitespace_,
+# so the dependency parser, NER and lemmatizer are never loaded.
+SPACY_EXCLUDE = ("parser", "ner", "lemmatizer")
+
+# Names confirmed present in this process; failures are not remembered, so a
+# later call retries the download instead of staying broken until restart.
+_nltk_available = set()
+_nltk_lock = threading.Lock()
+
+def ensure_nltk_data(names=NLTK_TOKENIZER_RESOURCES):
+    """
+    Make sure the named NLTK packages are available, downloading only those that
+    nltk.data.find cannot locate locally. Returns the names that are still missing.
+    """
+    missing = []
+    with _nltk_lock:
+        for name in names:
+            if name in _nltk_available:
+                continue
+            try:
+                nltk.data.find(NLTK_RESOURCES[name])
+            except LookupError:
+                if not nltk.download(name, quiet=True):
+                    missing.append(name)
+                    continue
+            _nltk_available.add(name)
+    return missing
+
+@st.cache_resource
+def _load_spacy():
+    # Raises on failure, and st.cache_resource does not cache exceptions
+    return spacy.load(SPACY_MODEL, exclude=list(SPACY_EXCLUDE))
+
+def load_spacy_model():
+    """Load the slimmed en_core_web_sm pipeline once, or None if it isn't installed (retried next call)."""
+    try:
+        return _load_spacy()
+    except OSError:
+        st.warning(f"Install spaCy model: python -m spacy download {SPACY_MODEL}")
+        return None
+
+def warm_up(models=False):
+    """
+    Load everything up front instead of on first request: NLTK data, spaCy and,
+    with models=True, the transformer pipelines (exporting ONNX copies first when
+    that backend is selected, and checking backend parity if HUMANIZER_CHECK_PARITY is set).
+    """
+    missing = ensure_nltk_data(tuple(NLTK_RESOURCES))
+    load_spacy_model()
+    if models:
+        from utils.model_loaders import (
+            CHECK_PARITY, INFERENCE_BACKEND, PIPELINE_MODELS, check_backend_parity, export_onnx,
+            load_detector_model, load_paraphrase_model
+        )
+        if INFERENCE_BACKEND == "onnx":
+            for task, model_name in PIPELINE_MODELS:
+                export_onnx(task, model_name)
+        if CHECK_PARITY and INFERENCE_BACKEND != "torch":
+            report = check_backend_parity(INFERENCE_BACKEND)
+            if not report["ok"]:
+                raise RuntimeError(f"{INFERENCE_BACKEND} backend disagrees with fp32 torch: {report}")
+        load_detector_model()
+        load_paraphrase_model()
+    return missing
+
+if __name__ == "__main__":
+    still_missing = warm_up(models="--models" in sys.argv)
+    if still_missing:
+        print(f"Missing NLTK data: {', '.join(still_missing)}")
@@ -0,0 +1,175 @@
+# utils/result_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Keys per SELECT ... IN (...) query, below SQLite's bound-parameter limit
+SQLITE_BATCH = 500
+
+def make_key(*parts):
+    """Content-address a call: SHA-256 over the JSON-encoded arguments."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    Bounded LRU cache with an optional TTL and an optional SQLite file tier.
+    Values must be JSON-serializable when a path is given.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, created REAL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _lookup_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, created = entry
+            if not self._expired(created):
+                self._entries.move_to_end(key)
+                return True, value
+            del self._entries[key]
+        return False, None
+
+    def _lookup_disk(self, keys):
+        """Fetch unexpired disk entries for keys, promoting them into memory."""
+        found = {}
+        expired = []
+        keys = list(keys)
+        for start in range(0, len(keys), SQLITE_BATCH):
+            chunk = keys[start:start + SQLITE_BATCH]
+            rows = self._db.execute(
+                f"SELECT key, value, created FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for key, value, created in rows:
+                if self._expired(created):
+                    expired.append(key)
+                    continue
+                value = json.loads(value)
+                self.disk_hits += 1
+                self._remember(key, value, created)
+                found[key] = value
+        if expired:
+            self._db.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in expired])
+            self._db.commit()
+        return found
+
+    def _lookup(self, key):
+        found, value = self._lookup_memory(key)
+        if found or self._db is None:
+            return found, value
+        disk = self._lookup_disk([key])
+        return (True, disk[key]) if key in disk else (False, None)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store value under key in memory and, if configured, on disk."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created)
+                )
+                self._db.commit()
+
+    def get_many(self, keys):
+        """Look up several keys at once (one disk query per batch); returns {key: value} for the hits."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                hit, value = self._lookup_memory(key)
+                if hit:
+                    found[key] = value
+                else:
+                    missing.append(key)
+            if missing and self._db is not None:
+                found.update(self._lookup_disk(missing))
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items):
+        """Store several (key, value) pairs, committing to disk once."""
+        items = list(items)
+        created = time.time()
+        with self._lock:
+            for key, value in items:
+                self._remember(key, value, created)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value), created) for key, value in items]
+                )
+                self._db.commit()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() and storing it on a miss."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry from memory and disk and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters and occupancy, for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
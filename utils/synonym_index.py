@@ -0,0 +1,266 @@
+# utils/synonym_index.py
+"""
+Precompiled synonym index built from word_lists.ULTRA_SYNONYMS, bundled with the
+other word tables the humanizer reads at runtime (RUNTIME_TABLES).
+
+Preserve-word exclusion, POS tags and multi-word flags are all resolved when the
+index is built. Every (word, POS, phrases allowed?) combination maps to a
+precomputed candidate slot, so a whole document's replacements can be drawn with
+one vectorized call. The index and the runtime tables are serialized to a compact
+binary file that workers mmap instead of executing word_lists.py.
+
+    python -m utils.synonym_index     # (re)build synonym_index.bin
+"""
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORD_LISTS_PATH = os.path.join(ROOT_DIR, "word_lists.py")
+SYNONYM_INDEX_PATH = os.environ.get("HUMANIZER_SYNONYM_INDEX", os.path.join(ROOT_DIR, "synonym_index.bin"))
+
+# Index 0 means "untagged": usable whatever POS the token has
+POS_TAGS = ("", "NOUN", "VERB", "ADJ", "ADV")
+POS_IDS = {tag: i for i, tag in enumerate(POS_TAGS)}
+
+MAGIC = b"SYNIDX02"
+HEADER = struct.Struct("<8sIIIII")  # magic, strings, keys, candidates, slot entries, table bytes
+
+# word_lists tables pages.humanize_text uses besides the synonyms; stored as JSON
+RUNTIME_TABLES = ("DIVERSE_STARTERS", "AI_RED_FLAGS", "CONTRACTIONS_MAP", "HUMAN_FILLERS", "INFORMAL_REPLACEMENTS")
+
+# Suffix rules used to tag candidates at build time; anything else stays untagged
+POS_SUFFIXES = (
+    ("VERB", ("ize", "ise", "ify")),
+    ("ADV", ("ly",)),
+    ("NOUN", ("tion", "sion", "ment", "ness", "ity", "ance", "ence", "ism", "ship", "hood")),
+    ("ADJ", ("ous", "ful", "ive", "able", "ible", "ical", "less", "ic")),
+)
+NOT_ADVERBS = {"apply", "reply", "supply", "rely", "ally", "fly", "comply", "multiply", "imply"}
+
+def guess_pos(candidate):
+    """Best-effort POS for a candidate (by its first word); "" when unsure."""
+    head = candidate.split()[0].lower()
+    if head in NOT_ADVERBS:
+        return "VERB"
+    for tag, suffixes in POS_SUFFIXES:
+        if head.endswith(suffixes) and len(head) > max(len(s) for s in suffixes) + 1:
+            return tag
+    return ""
+
+def _slot(pos_id, allow_phrases):
+    return pos_id * 2 + (1 if allow_phrases else 0)
+
+SLOTS_PER_KEY = len(POS_TAGS) * 2
+
+class SynonymIndex:
+    """Word -> candidate lookup over flat arrays (possibly backed by an mmap)."""
+
+    def __init__(self, strings, key_strings, cand_strings, cand_pos, cand_flags, slot_start, slot_count, slot_cands,
+                 tables=None):
+        self.strings = strings
+        self.tables = tables or {}
+        self.key_strings = key_strings
+        self.cand_strings = cand_strings
+        self.keys = tuple(strings[i] for i in key_strings)
+        self.key_ids = {key: i for i, key in enumerate(self.keys)}
+        self.candidates = tuple(strings[i] for i in cand_strings)
+        self.cand_pos = cand_pos
+        self.cand_flags = cand_flags
+        self.slot_start = slot_start.reshape(len(self.keys), SLOTS_PER_KEY)
+        self.slot_count = slot_count.reshape(len(self.keys), SLOTS_PER_KEY)
+        self.slot_cands = slot_cands
+
+    def _slot_of(self, word, pos, allow_phrases):
+        key_id = self.key_ids.get(word.lower())
+        if key_id is None:
+            return None, 0, 0
+        slot = _slot(POS_IDS.get(pos, 0), allow_phrases)
+        return key_id, int(self.slot_start[key_id, slot]), int(self.slot_count[key_id, slot])
+
+    def lookup(self, word, pos=None, allow_phrases=True):
+        """Candidate tuple for word with the given spaCy POS (empty if none)."""
+        _, start, count = self._slot_of(word, pos, allow_phrases)
+        return tuple(self.candidates[i] for i in self.slot_cands[start:start + count])
+
+    def has(self, word, pos=None, allow_phrases=True):
+        return self._slot_of(word, pos, allow_phrases)[2] > 0
+
+    def choose(self, word, pos=None, allow_phrases=True, rng=random):
+        """One random candidate for word, or None."""
+        _, start, count = self._slot_of(word, pos, allow_phrases)
+        if not count:
+            return None
+        return self.candidates[self.slot_cands[start + rng.randrange(count)]]
+
+    def sample(self, words, pos_tags, rng=None, allow_phrases=True):
+        """
+        Vectorized choose(): one candidate (or None) for every (word, POS) slot,
+        drawn with a single NumPy call.
+        """
+        if not words or not self.slot_cands.size:
+            return [None] * len(words)
+        rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        key_ids = np.array([self.key_ids.get(w.lower(), -1) for w in words], dtype=np.int64)
+        slots = np.array([_slot(POS_IDS.get(p, 0), allow_phrases) for p in pos_tags], dtype=np.int64)
+        known = key_ids >= 0
+        starts = np.zeros(len(words), dtype=np.int64)
+        counts = np.zeros(len(words), dtype=np.int64)
+        starts[known] = self.slot_start[key_ids[known], slots[known]]
+        counts[known] = self.slot_count[key_ids[known], slots[known]]
+        offsets = np.floor(rng.random(len(words)) * counts).astype(np.int64)
+        picks = self.slot_cands[np.where(counts > 0, starts + offsets, 0)]
+        return [self.candidates[p] if c else None for p, c in zip(picks.tolist(), counts.tolist())]
+
+########################################
+# Building
+########################################
+def build_index(synonyms=None, preserve=None, tables=None):
+    """Compile the synonym table and the runtime tables (defaults to word_lists) into a SynonymIndex."""
+    if synonyms is None or preserve is None or tables is None:
+        import word_lists
+        synonyms = word_lists.ULTRA_SYNONYMS if synonyms is None else synonyms
+        preserve = word_lists.PRESERVE_WORDS if preserve is None else preserve
+        tables = {name: getattr(word_lists, name) for name in RUNTIME_TABLES} if tables is None else tables
+
+    strings, string_ids = [], {}
+
+    def intern_string(s):
+        if s not in string_ids:
+            string_ids[s] = len(strings)
+            strings.append(sys.intern(s))
+        return string_ids[s]
+
+    key_strings, cand_strings, cand_pos, cand_flags = [], [], [], []
+    slot_start, slot_count, slot_cands = [], [], []
+    for key, values in synonyms.items():
+        key = key.lower()
+        if key in preserve or not values:
+            continue
+        key_strings.append(intern_string(key))
+        first = len(cand_strings)
+        for candidate in values:
+            cand_strings.append(intern_string(candidate))
+            cand_pos.append(POS_IDS[guess_pos(candidate)])
+            cand_flags.append(1 if " " in candidate else 0)
+        members = range(first, len(cand_strings))
+
+        for pos_id in range(len(POS_TAGS)):
+            for allow_phrases in (False, True):
+                usable = [c for c in members if allow_phrases or not cand_flags[c]]
+                if pos_id:
+                    # Matching or untagged candidates; fall back to everything usable
+                    usable = [c for c in usable if cand_pos[c] in (0, pos_id)] or usable
+                slot_start.append(len(slot_cands))
+                slot_count.append(len(usable))
+                slot_cands.extend(usable)
+
+    return SynonymIndex(
+        strings,
+        np.array(key_strings, dtype=np.uint32),
+        np.array(cand_strings, dtype=np.uint32),
+        np.array(cand_pos, dtype=np.uint8),
+        np.array(cand_flags, dtype=np.uint8),
+        np.array(slot_start, dtype=np.uint32),
+        np.array(slot_count, dtype=np.uint32),
+        np.array(slot_cands, dtype=np.uint32),
+        tables,
+    )
+
+########################################
+# Binary serialization
+########################################
+def save_index(index, path=SYNONYM_INDEX_PATH):
+    """Write the index as: header, uint32 arrays, uint8 arrays, the UTF-8 string blob, then the tables as JSON."""
+    encoded = [s.encode("utf-8") for s in index.strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    arrays = [
+        offsets,
+        index.key_strings.astype(np.uint32),
+        index.cand_strings.astype(np.uint32),
+        index.slot_start.astype(np.uint32).ravel(),
+        index.slot_count.astype(np.uint32).ravel(),
+        index.slot_cands.astype(np.uint32),
+        index.cand_pos.astype(np.uint8),
+        index.cand_flags.astype(np.uint8),
+    ]
+    tables = json.dumps(index.tables, ensure_ascii=False).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, len(encoded), len(index.keys), len(index.candidates), len(index.slot_cands), len(tables)
+        ))
+        for array in arrays:
+            f.write(array.tobytes())
+        f.write(b"".join(encoded))
+        f.write(tables)
+    os.replace(tmp_path, path)
+
+def load_index(path=SYNONYM_INDEX_PATH):
+    """Map a saved index into memory; arrays are zero-copy views over the mmap."""
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, n_strings, n_keys, n_cands, n_slot_cands, n_table_bytes = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a synonym index")
+    offset = HEADER.size
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+
+    offsets = take(np.uint32, n_strings + 1)
+    key_strings = take(np.uint32, n_keys)
+    cand_strings = take(np.uint32, n_cands)
+    slot_start = take(np.uint32, n_keys * SLOTS_PER_KEY)
+    slot_count = take(np.uint32, n_keys * SLOTS_PER_KEY)
+    slot_cands = take(np.uint32, n_slot_cands)
+    cand_pos = take(np.uint8, n_cands)
+    cand_flags = take(np.uint8, n_cands)
+    blob = buf[offset:offset + int(offsets[-1])]
+    offset += int(offsets[-1])
+    tables = json.loads(buf[offset:offset + n_table_bytes].decode("utf-8"))
+    strings = [
+        sys.intern(blob[start:end].decode("utf-8"))
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+    return SynonymIndex(
+        strings, key_strings, cand_strings, cand_pos, cand_flags, slot_start, slot_count, slot_cands, tables
+    )
+
+_index = None
+
+def get_synonym_index(path=SYNONYM_INDEX_PATH):
+    """
+    Process-wide index: mmap the binary file when it is newer than word_lists.py,
+    otherwise build from word_lists and (best effort) refresh the file.
+    """
+    global _index
+    if _index is None:
+        try:
+            if os.path.getmtime(path) >= os.path.getmtime(WORD_LISTS_PATH):
+                _index = load_index(path)
+        except (OSError, ValueError, struct.error):
+            _index = None
+        if _index is None:
+            _index = build_index()
+            try:
+                save_index(_index, path)
+            except OSError:
+                pass
+    return _index
+
+def get_word_tables(path=SYNONYM_INDEX_PATH):
+    """{name: table} for RUNTIME_TABLES, from the same file as the synonym index."""
+    return get_synonym_index(path).tables
+
+if __name__ == "__main__":
+    save_index(build_index())
+    print(f"Wrote {SYNONYM_INDEX_PATH}")